@@ -1,50 +1,163 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from datetime import datetime, timezone, timedelta
-from docx import Document
-from docx2pdf import convert
+from docx_template import TemplateCache
+from pdf_converters import create_converter, default_converter_name, LibreOfficeConverter, StubConverter
+from pdf_queue import PdfJobQueue, PdfQueueFullError, DONE, FAILED
+from bulk_import import detect_format, iter_csv_rows, iter_jsonl_rows, coerce_csv_row, coerce_json_row
+from serialization import ColumnSerializer, dumps
+from pricing import Portfolio, PREMIUM_FIELDS, SCENARIO_CRITERIA, price_devis, summarize, validate_scenarios
+from database import database_uri, engine_options, configure_sqlite, begin_write
+from document_store import ArtifactCollector, shard_path
+from render_pool import RenderPool
+from sqlalchemy.exc import IntegrityError
+import migrations
+import render_queue
+import rollups
+from search import search_terms, search_statement
+from change_feed import ChangeNotifier, head_version, read_changes, format_event
+from response_cache import ResponseCache
+from metrics import MetricsRegistry
+from logging_config import configure_logging, SAMPLED
+from zip_stream import iter_zip
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import os
-import threading
 import pytz
 import re
-import glob
+import json
+import csv
+import io
+import base64
+import hashlib
+import tempfile
+import threading
+import time
 import logging
+import atexit
+import multiprocessing
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("tarification.log")
-    ]
+# Configure logging : écriture par un thread dédié, messages du chemin critique
+# (extra=SAMPLED) conservés dans la proportion LOG_SAMPLE_RATE
+log_listener = configure_logging(
+    os.environ.get('LOG_FILE', "tarification.log"),
+    sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 0.1)),
 )
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
+# Métriques exposées au format Prometheus sur /metrics
+metrics = MetricsRegistry()
+request_latency = metrics.histogram(
+    'tarification_http_request_duration_seconds', "Durée des requêtes HTTP par endpoint",
+    labels=['method', 'endpoint', 'status'],
+)
+document_stage_latency = metrics.histogram(
+    'tarification_document_stage_duration_seconds', "Durée des étapes de génération des documents",
+    labels=['stage'],
+)
+render_job_results = metrics.counter(
+    'tarification_render_jobs_total', "Rendus de documents en arrière-plan par résultat",
+    labels=['status'],
+)
+pdf_conversion_results = metrics.counter(
+    'tarification_pdf_conversions_total', "Conversions PDF par résultat", labels=['status'],
+)
+metrics.gauge(
+    'tarification_pdf_queue_depth', "Conversions PDF en attente d'un worker",
+    callback=lambda: pdf_queue.depth,
+)
+metrics.gauge(
+    'tarification_render_queue_depth', "Rendus de documents en attente dans la table render_job",
+    callback=lambda: render_jobs.depth(),
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def observe_request_latency(response):
+    # Pour un flux (export), seule la préparation de la réponse est mesurée
+    started = g.pop('request_started', None)
+    if started is not None:
+        request_latency.observe(
+            time.perf_counter() - started, method=request.method,
+            endpoint=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            status=response.status_code,
+        )
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.content_type)
+
+# Les processus du pool de rendu (méthode 'spawn') peuvent réimporter ce module, sous le nom
+# __mp_main__ ou app selon le lancement : migrations seulement dans le processus principal
+MAIN_PROCESS = multiprocessing.parent_process() is None
+
 # Path constants
 TEMPLATE_DIR = "template_docx"
-DOC_DIR = "documents"
+DOC_DIR = os.environ.get('DOCUMENT_DIR', "documents")
+
+# Conversion PDF : 'docx2pdf' (Word, Windows), 'libreoffice' (pool LibreOffice headless)
+# ou 'stub' (PDF vide, pour les benchmarks)
+PDF_CONVERTER = os.environ.get('PDF_CONVERTER', default_converter_name())
+PDF_CONVERTER_OPTIONS = {}
+if PDF_CONVERTER == LibreOfficeConverter.name:
+    PDF_CONVERTER_OPTIONS = {
+        'workers': int(os.environ.get('PDF_WORKERS', 2)),
+        'max_jobs_per_worker': int(os.environ.get('PDF_MAX_JOBS_PER_WORKER', 200)),
+        'job_timeout': int(os.environ.get('PDF_JOB_TIMEOUT', 60)),
+        'base_port': int(os.environ.get('UNOSERVER_BASE_PORT', 2003)),
+        'unoserver_path': os.environ.get('UNOSERVER_PATH', 'unoserver'),
+        'soffice_path': os.environ.get('SOFFICE_PATH'),
+    }
+elif PDF_CONVERTER == StubConverter.name:
+    PDF_CONVERTER_OPTIONS = {'delay': float(os.environ.get('PDF_STUB_DELAY', 0))}
+pdf_converter = create_converter(PDF_CONVERTER, **PDF_CONVERTER_OPTIONS)
+atexit.register(pdf_converter.close)
+
+# File de conversion PDF : nombre de workers fixe, dédoublonnage par fichier PDF
+pdf_queue = PdfJobQueue(
+    pdf_converter,
+    on_complete=lambda job: on_pdf_complete(job),
+    workers=int(os.environ.get('PDF_QUEUE_WORKERS', PDF_CONVERTER_OPTIONS.get('workers', 1))),
+    max_pending=int(os.environ.get('PDF_QUEUE_MAX_PENDING', 100)),
+)
+# Durée maximale d'attente d'un PDF par l'endpoint de téléchargement (secondes)
+PDF_WAIT_TIMEOUT = int(os.environ.get('PDF_WAIT_TIMEOUT', 120))
+
+# Rendu DOCX : 'thread' (dans le processus Flask) ou 'process' (pool de processus, tous les cœurs)
+RENDER_MODE = os.environ.get('RENDER_MODE', 'thread')
+RENDER_PROCESSES = int(os.environ.get('RENDER_PROCESSES', os.cpu_count() or 1))
 
-# Configuration SQLite
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///devis.db'
+# Base de données : DATABASE_URL (PostgreSQL en production), SQLite par défaut
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db = SQLAlchemy(app)
+with app.app_context():
+    # Mode WAL, synchronous=NORMAL et busy_timeout pour SQLite
+    configure_sqlite(db.engine)
 
 # Définir le modèle de données
 class Devis(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    numero_opportunite = db.Column(db.String(100))
+    numero_opportunite = db.Column(db.String(100), index=True)
     nom_client = db.Column(db.String(100))
     date_creation = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), 
                                   onupdate=lambda: datetime.now(timezone.utc))
     type_travaux = db.Column(db.String(50))
     cout_ouvrage = db.Column(db.Float)
     presence_existant = db.Column(db.Boolean)
-    client_vip = db.Column(db.Boolean)
-    garantie = db.Column(db.String(50))
+    client_vip = db.Column(db.Boolean, index=True)
+    garantie = db.Column(db.String(50), index=True)
     souhaite_rcmo = db.Column(db.Boolean)
     assurer_intervenants = db.Column(db.Boolean, default=False)
     destination_ouvrage = db.Column(db.String(100))
@@ -67,43 +180,215 @@ class Devis(db.Model):
     franchise_trc = db.Column(db.Float, nullable=True)
     franchise_maintenance = db.Column(db.Float, nullable=True)
 
-# Créer les tables si elles n'existent pas
+    # Index composites (clé de tri, id) pour la pagination par curseur.
+    # Le schéma est créé par migrations.py : tout changement ici y ajoute une migration.
+    __table_args__ = (
+        db.Index('ix_devis_date_creation_id', 'date_creation', 'id'),
+        db.Index('ix_devis_prime_totale_id', 'prime_totale', 'id'),
+        db.Index('ix_devis_numero_opportunite_id', 'numero_opportunite', 'id'),
+    )
+
+
+# Documents générés (DOCX, PDF) : fichier courant de chaque devis. Une ligne sans devis_id
+# est un ancien document, supprimé par le ramasse-miettes s'il n'est plus référencé.
+class DocumentArtifact(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    devis_id = db.Column(db.Integer, db.ForeignKey('devis.id', ondelete='SET NULL'))
+    kind = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    hash = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.UniqueConstraint('devis_id', 'kind', name='uq_document_artifact_devis_kind'),
+        db.Index('ix_document_artifact_path', 'path'),
+        db.Index('ix_document_artifact_hash_kind', 'hash', 'kind'),
+        db.Index('ix_document_artifact_devis_created', 'devis_id', 'created_at'),
+    )
+
+
+# Rendus de documents à produire ou produits, un par devis (voir render_queue)
+class RenderJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    devis_id = db.Column(db.Integer, db.ForeignKey('devis.id', ondelete='CASCADE'),
+                         nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    requested_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_render_job_status_requested', 'status', 'requested_at'),
+    )
+
+
+# Totaux des primes par combinaison de dimensions, tenus à jour à chaque écriture (voir rollups)
+class DevisRollup(db.Model):
+    garantie = db.Column(db.String(50), primary_key=True)
+    type_travaux = db.Column(db.String(50), primary_key=True)
+    destination_ouvrage = db.Column(db.String(100), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    client_vip = db.Column(db.Boolean, primary_key=True)
+    devis_count = db.Column(db.Integer, nullable=False)
+    prime_do = db.Column(db.Float, nullable=False)
+    prime_trc = db.Column(db.Float, nullable=False)
+    prime_rcmo = db.Column(db.Float, nullable=False)
+    prime_totale = db.Column(db.Float, nullable=False)
+
+
+# Dernière version de chaque devis pour la synchronisation incrémentale, écrite par des
+# triggers à chaque écriture (voir change_feed)
+class DevisChange(db.Model):
+    devis_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index('ix_devis_change_version', 'version', unique=True),
+    )
+
+
+class DevisChangeCounter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
+
+# Mettre le schéma à jour (migrations versionnées) ; DB_AUTO_MIGRATE=0 pour le faire
+# séparément avec `flask --app app db-upgrade` avant le démarrage des workers
+if MAIN_PROCESS and os.environ.get('DB_AUTO_MIGRATE', '1') not in ['0', 'false']:
+    with app.app_context():
+        version = migrations.upgrade(db.engine)
+        logger.info(f"Base de données initialisée avec succès (schéma version {version}) !")
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the premium totals of the devis_rollup table from the devis table."""
+    rollups.rebuild(db.session, DevisRollup.__table__, Devis.__table__)
+    db.session.commit()
+    print("Totaux des primes recalculés")
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply the pending schema migrations."""
+    version = migrations.upgrade(db.engine)
+    print(f"Schéma de la base de données à la version {version}")
+
+
+# Suppression en arrière-plan des documents qui ne sont plus utilisés par aucun devis
+DOCUMENT_GC_INTERVAL = int(os.environ.get('DOCUMENT_GC_INTERVAL', 300))
 with app.app_context():
-    db.create_all()
-    logger.info("Base de données initialisée avec succès !")
+    document_collector = ArtifactCollector(
+        db.engine, DocumentArtifact.__table__, DOC_DIR,
+        interval=DOCUMENT_GC_INTERVAL,
+        sweep_interval=int(os.environ.get('DOCUMENT_GC_SWEEP_INTERVAL', 86400)),
+        grace=int(os.environ.get('DOCUMENT_GC_GRACE', 3600)),
+    )
+
+# Rendu des documents en arrière-plan, à partir de la table render_job
+# (avec le pool de processus, au moins un thread par processus de rendu)
+RENDER_WORKERS = int(os.environ.get(
+    'RENDER_WORKERS', max(2, RENDER_PROCESSES) if RENDER_MODE == 'process' else 2
+))
+with app.app_context():
+    render_jobs = render_queue.RenderJobQueue(
+        db.engine, RenderJob.__table__, lambda devis_id: render_devis_documents(devis_id),
+        workers=RENDER_WORKERS,
+        poll_interval=int(os.environ.get('RENDER_POLL_INTERVAL', 5)),
+        max_attempts=int(os.environ.get('RENDER_MAX_ATTEMPTS', 3)),
+        on_complete=lambda devis_id, status: on_render_complete(devis_id, status),
+    )
+
+# Sérialiseur généré à partir des colonnes du modèle
+devis_serializer = ColumnSerializer(Devis.__table__)
 
 def serialize_devis(devis):
+    return devis_serializer.serialize_object(devis)
+
+
+# Réponses de lecture gardées quelques secondes en mémoire, vidées à chaque écriture
+response_cache = ResponseCache(
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 10)),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+)
+
+
+# Réveil des flux d'événements /api/devis/changes/stream de ce processus
+change_notifier = ChangeNotifier()
+
+
+def devis_changed():
+    """To call after committing a write to the devis table."""
+    response_cache.invalidate()
+    change_notifier.notify()
+
+
+def on_render_complete(devis_id, status):
+    """RenderJobQueue callback: the render_status of the devis has changed."""
+    response_cache.invalidate()
+    if status in [render_queue.DONE, render_queue.FAILED]:
+        change_notifier.document_ready({'id': devis_id, 'kind': 'render', 'status': status})
+
+
+def last_modified_of(devis):
+    """Last-Modified of the documents of a devis: date_creation, reset by every update."""
+    if devis.date_creation.tzinfo is None:
+        return devis.date_creation.replace(tzinfo=timezone.utc)
+    return devis.date_creation
+
+
+def cached_json_response(key, build):
+    """JSON response with ETag, served from response_cache when possible.
+
+    `build()` returns (body bytes, last_modified or None) and is only called on a cache miss.
+    A request carrying the current ETag in If-None-Match gets a 304 without a body.
+    """
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation
+        body, last_modified = build()
+        cached = (body, hashlib.sha256(body).hexdigest(), last_modified)
+        response_cache.set(key, cached, generation)
+    body, etag, last_modified = cached
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Le client garde la réponse mais la revalide à chaque fois (304 si inchangée)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def document_response(document):
+    """send_file of a (path, content hash, last_modified, download_name) document tuple.
+
+    The content hash is the ETag, so a client already holding the file gets a 304.
+    """
+    path, key, last_modified, download_name = document
+    response = send_file(path, as_attachment=True, download_name=download_name,
+                         etag=key, last_modified=last_modified, conditional=True)
+    response.cache_control.no_cache = True
+    return response
+
+
+def column_values(devis):
+    """Column values of a Devis instance, keyed by column name."""
+    return {c.name: getattr(devis, c.name) for c in Devis.__table__.columns}
+
+
+def get_render_status(devis_id):
+    """Rendering state of the documents of a devis, as reported on the devis."""
+    job = RenderJob.query.filter_by(devis_id=devis_id).first()
+    if job is None:
+        # Devis antérieur à la file de rendu : documents produits à la demande
+        status = render_queue.DONE if get_artifact(devis_id, "docx") is not None else 'missing'
+        return {'status': status, 'error': None, 'updated_at': None}
     return {
-        'id': devis.id,
-        'numero_opportunite': devis.numero_opportunite,
-        'nom_client': devis.nom_client,
-        'date_creation': devis.date_creation.isoformat(),
-        'type_travaux': devis.type_travaux,
-        'cout_ouvrage': devis.cout_ouvrage,
-        'presence_existant': devis.presence_existant,
-        'client_vip': devis.client_vip,
-        'garantie': devis.garantie,
-        'souhaite_rcmo': devis.souhaite_rcmo,
-        'assurer_intervenants': devis.assurer_intervenants,
-        'destination_ouvrage': devis.destination_ouvrage,
-        'adresse_chantier': devis.adresse_chantier,
-        'description_ouvrage': devis.description_ouvrage,
-        'taux_do': devis.taux_do,
-        'taux_trc': devis.taux_trc,
-        'taux_rcmo': devis.taux_rcmo,
-        'franchise_rcmo': devis.franchise_rcmo,
-        'prime_do': devis.prime_do,
-        'prime_trc': devis.prime_trc,
-        'prime_rcmo': devis.prime_rcmo,
-        'prime_totale': devis.prime_totale,
-        'montant_dm': devis.montant_dm,
-        'montant_maintenance_visite': devis.montant_maintenance_visite,
-        'montant_mesures_conservatoires': devis.montant_mesures_conservatoires,
-        'montant_rcmo': devis.montant_rcmo,
-        'montant_do': devis.montant_do,
-        'montant_trc': devis.montant_trc,
-        'franchise_trc': devis.franchise_trc,
-        'franchise_maintenance': devis.franchise_maintenance
+        'status': job.status,
+        'error': job.error,
+        'updated_at': job.updated_at.isoformat(),
     }
 
 def sanitize_filename(value):
@@ -127,7 +412,11 @@ def replace_in_runs(runs, values):
                 run.text = run.text.replace(key, str(val))
 
 def replace_placeholders_in_doc(doc, values):
-    """Replace all placeholders in paragraphs and tables in a Word document."""
+    """Replace all placeholders in paragraphs and tables in a Word document.
+
+    Reference python-docx implementation: generate_docx_file renders through
+    docx_template, which produces the same text from a template compiled once.
+    """
     # Replace in paragraphs
     for p in doc.paragraphs:
         inline_text = ''.join(run.text for run in p.runs)
@@ -154,77 +443,112 @@ def replace_placeholders_in_doc(doc, values):
                         for i in range(1, len(paragraph.runs)):
                             paragraph.runs[i].text = ''
 
+# Template à utiliser pour chaque combinaison (garantie, souhaite_rcmo)
+TEMPLATE_FILENAMES = {
+    ("DO+TRC", True): "template_do_trc_rcmo.docx",
+    ("DO+TRC", False): "template_do_trc.docx",
+    ("TRC", True): "template_trc_rcmo.docx",
+    ("TRC", False): "template_trc.docx",
+    ("DO", True): "template_do_rcmo.docx",
+    ("DO", False): "template_do.docx",
+}
+DEFAULT_TEMPLATE_FILENAME = "template_do.docx"
+
+# Emplacements à remplacer dans les templates (clés de build_template_values)
+TEMPLATE_PLACEHOLDERS = (
+    "numero_opportunite", "nom_client", "destination_ouvrage", "type_travaux",
+    "cout_ouvrage", "presence_existant", "garantie", "description_ouvrage",
+    "adresse_chantier", "date_creation",
+    "prime_do", "montant_do",
+    "prime_trc", "franchise_trc", "franchise_maintenance", "montant_dm",
+    "montant_maintenance_visite", "montant_mesures_conservatoires", "montant_trc",
+    "prime_rcmo", "franchise_rcmo", "assurer_intervenants", "montant_rcmo",
+    "prime_totale",
+)
+
+# Templates compilés gardés en mémoire, rechargés si le fichier est modifié
+template_cache = TemplateCache(TEMPLATE_PLACEHOLDERS)
+
+# Pool de processus de rendu, chacun avec tous les templates compilés au démarrage ;
+# démarré au premier rendu, jamais à l'import (les processus du pool importent ce module)
+render_pool = None
+if RENDER_MODE == 'process':
+    render_pool = RenderPool(
+        TEMPLATE_PLACEHOLDERS,
+        sorted({os.path.join(TEMPLATE_DIR, filename) for filename in TEMPLATE_FILENAMES.values()}),
+        workers=RENDER_PROCESSES,
+        max_jobs_per_worker=int(os.environ.get('RENDER_MAX_JOBS_PER_PROCESS', 500)),
+        timeout=int(os.environ.get('RENDER_TIMEOUT', 60)),
+    )
+    atexit.register(render_pool.close)
+
+
+# Threads et processus d'arrière-plan, démarrés par le processus qui sert les requêtes
+# seulement : ni à l'import (commandes flask, processus du pool de rendu), ni dans le
+# processus de surveillance du rechargeur de debug
+_background_lock = threading.Lock()
+_background_started = False
+
+
+def start_background_services():
+    """Start the document GC, the render workers and the render pool, once per process."""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    if DOCUMENT_GC_INTERVAL > 0:
+        document_collector.start()
+    if RENDER_WORKERS > 0:
+        render_jobs.start()
+    if render_pool is not None:
+        render_pool.start()
+
+
+@app.before_request
+def ensure_background_services():
+    # Serveurs WSGI (flask run, gunicorn...) : démarrage à la première requête
+    if not _background_started:
+        start_background_services()
+
 # Fonction pour garantir l'existence du PDF (création si nécessaire)
 def ensure_pdf_exists(docx_path):
     """Checks if PDF exists for the given DOCX file, creates it if not.
     Returns the path to the PDF file."""
     pdf_path = docx_path.replace('.docx', '.pdf')
     if not os.path.exists(pdf_path):
-        import pythoncom
-        pythoncom.CoInitialize()
-        try:
-            convert(docx_path, pdf_path)
-            logger.info(f"PDF généré avec succès : {pdf_path}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la génération du PDF: {str(e)}")
-            raise e
-        finally:
-            pythoncom.CoUninitialize()
+        # Rejoint la conversion déjà en cours pour ce fichier s'il y en a une
+        job = pdf_queue.submit(docx_path, pdf_path)
+        if not job.wait(PDF_WAIT_TIMEOUT):
+            raise TimeoutError(f"PDF non généré après {PDF_WAIT_TIMEOUT} s : {pdf_path}")
+        if job.status == FAILED:
+            raise RuntimeError(job.error)
     return pdf_path
 
 # Fonction pour générer le PDF en arrière-plan
-def generate_pdf_async(docx_path, pdf_path):
-    import pythoncom
-    pythoncom.CoInitialize()
-    
+def queue_pdf_generation(docx_path, pdf_path):
     try:
-        convert(docx_path, pdf_path)
-        logger.info(f"PDF généré avec succès en arrière-plan : {pdf_path}")
-    except Exception as e:
-        logger.error(f"Erreur lors de la génération du PDF en arrière-plan: {str(e)}")
-    finally:
-        pythoncom.CoUninitialize()
+        pdf_queue.submit(docx_path, pdf_path)
+    except PdfQueueFullError as e:
+        # Le PDF sera généré à la première demande de téléchargement
+        logger.warning(f"{str(e)} : PDF différé pour {docx_path}")
 
 
-# Fonction pour générer le fichier DOCX en arrière-plan
-def generate_docx_file(devis_id):
-    devis = Devis.query.get_or_404(devis_id)
-    
-    # Sélection du template en fonction des options choisies
-    template_filename = ""
-    
+def select_template_filename(devis):
+    """Return the template filename matching the garantie and RCMO option of a devis."""
     # Déterminer le template en fonction des garanties choisies
-    if devis.garantie == "DO+TRC":
-        if devis.souhaite_rcmo:
-            template_filename = "template_do_trc_rcmo.docx"
-        else:
-            template_filename = "template_do_trc.docx"
-    elif devis.garantie == "TRC":
-        if devis.souhaite_rcmo:
-            template_filename = "template_trc_rcmo.docx"
-        else:
-            template_filename = "template_trc.docx"
-    elif devis.garantie == "DO":
-        if devis.souhaite_rcmo:
-            template_filename = "template_do_rcmo.docx"
-        else:
-            template_filename = "template_do.docx"
-    else:
+    template_filename = TEMPLATE_FILENAMES.get((devis.garantie, bool(devis.souhaite_rcmo)))
+    if template_filename is None:
         # Fallback au cas où la garantie n'est pas reconnue
-        template_filename = "template_do.docx"
-        logger.warning(f"Garantie non reconnue pour devis {devis_id}: {devis.garantie}. Utilisation du template par défaut.")
-    
-    template_path = os.path.join(TEMPLATE_DIR, template_filename)
-    
-    # Vérifier si le template existe
-    if not os.path.exists(template_path):
-        logger.error(f"Template {template_filename} introuvable. Chemin: {template_path}")
-        raise FileNotFoundError(f"Template {template_filename} introuvable.")
-    
-    doc = Document(template_path)
-    
+        template_filename = DEFAULT_TEMPLATE_FILENAME
+        logger.warning(f"Garantie non reconnue pour devis {devis.id}: {devis.garantie}. Utilisation du template par défaut.")
+    return template_filename
+
+
+def build_template_values(devis):
+    """Format the values of a devis for every placeholder of TEMPLATE_PLACEHOLDERS."""
     # Préparer toutes les valeurs dans un seul dictionnaire, sans conditions
-    values = {
+    return {
         # Valeurs communes
         "numero_opportunite": devis.numero_opportunite or "",
         "nom_client": devis.nom_client or "",
@@ -259,46 +583,197 @@ def generate_docx_file(devis_id):
         # Autres valeurs
         "prime_totale": f"{devis.prime_totale:,.2f} €" if devis.prime_totale is not None else "0,00 €",
     }
+
+
+def get_document_template(devis):
+    """Return the compiled template used to render a devis."""
+    # Sélection du template en fonction des options choisies
+    template_filename = select_template_filename(devis)
+    template_path = os.path.join(TEMPLATE_DIR, template_filename)
     
-    # Remplacer tous les placeholders dans le document
-    replace_placeholders_in_doc(doc, values)
+    # Vérifier si le template existe
+    if not os.path.exists(template_path):
+        logger.error(f"Template {template_filename} introuvable. Chemin: {template_path}")
+        raise FileNotFoundError(f"Template {template_filename} introuvable.")
     
-    # Convertir UTC en heure Europe/Paris
-    date_local = to_paris_time(devis.date_creation)
+    return template_cache.get(template_path)
+
+
+def document_key(template, values):
+    """Content hash of a rendered document: template content plus formatted values."""
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(template.digest.encode('ascii') + b'\0' + payload).hexdigest()
+
+
+def get_docx_path(devis):
+    """Content-addressed path of the DOCX of a devis, whether it has been generated or not."""
+    template = get_document_template(devis)
+    key = document_key(template, build_template_values(devis))
+    return shard_path(DOC_DIR, key, "docx")
+
+
+def get_artifact(devis_id, kind):
+    """Return the current DocumentArtifact of a devis for `kind` ('docx' or 'pdf'), or None."""
+    return DocumentArtifact.query.filter_by(devis_id=devis_id, kind=kind).first()
+
+
+def record_artifact(devis_id, kind, path, key):
+    """Make `path` the current `kind` document of a devis (not committed).
+
+    The document it replaces is kept as an orphan row for the garbage collector.
+    """
+    artifact = get_artifact(devis_id, kind)
+    if artifact is not None:
+        if artifact.hash == key:
+            return artifact
+        retire_artifact(artifact)
+        db.session.flush()
+    artifact = DocumentArtifact(devis_id=devis_id, kind=kind, path=path, hash=key,
+                                size=os.path.getsize(path))
+    db.session.add(artifact)
+    return artifact
+
+
+def retire_artifact(artifact):
+    """Detach a document from its devis; the garbage collector deletes it once unused."""
+    artifact.devis_id = None
+    artifact.created_at = datetime.now(timezone.utc)
+
 
-    filename = generate_filename(devis.numero_opportunite, date_local, "docx")
-    filepath = os.path.join(DOC_DIR, filename)
-    os.makedirs(DOC_DIR, exist_ok=True)
-    doc.save(filepath)
+def current_docx_path(devis):
+    """Path of the up-to-date DOCX of a devis, rendered if needed.
+
+    The artifact table answers without rendering when the document is current; a file
+    removed since (GC sweep, by hand) is rendered again.
+    """
+    artifact = get_artifact(devis.id, "docx")
+    if artifact is not None and artifact.path == get_docx_path(devis) and os.path.exists(artifact.path):
+        return artifact.path
+    return generate_docx_file(devis)
+
+
+def get_download_name(devis, ext):
+    """Filename proposed to the user when downloading the document of a devis."""
+    return generate_filename(devis.numero_opportunite, to_paris_time(devis.date_creation), ext)
+
+
+def record_documents(devis_id, filepath, pdf_filepath, key):
+    """Record the rendered DOCX of a devis, and its PDF if it already exists, then commit."""
+    record_artifact(devis_id, "docx", filepath, key)
+    pdf_artifact = get_artifact(devis_id, "pdf")
+    if pdf_artifact is not None and pdf_artifact.hash != key:
+        # Le PDF correspond à l'ancien contenu du devis
+        retire_artifact(pdf_artifact)
+        pdf_artifact = None
+    if pdf_artifact is None and os.path.exists(pdf_filepath):
+        # PDF déjà produit pour un devis au contenu identique
+        record_artifact(devis_id, "pdf", pdf_filepath, key)
+    db.session.commit()
+
+
+# Fonction pour générer le fichier DOCX d'un devis déjà chargé
+def generate_docx_file(devis):
+    with document_stage_latency.time(stage='template_load'):
+        template = get_document_template(devis)
+    with document_stage_latency.time(stage='values'):
+        values = build_template_values(devis)
+        # Les documents sont nommés par le hash de leur contenu : un rendu identique
+        # (même template, mêmes valeurs) réutilise les fichiers déjà produits
+        key = document_key(template, values)
+    filepath = shard_path(DOC_DIR, key, "docx")
+    pdf_filepath = shard_path(DOC_DIR, key, "pdf")
     
-    pdf_filepath = filepath.replace('.docx', '.pdf')
+    if not os.path.exists(filepath):
+        directory = os.path.dirname(filepath)
+        os.makedirs(directory, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage atomique
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            if render_pool is not None:
+                # Remplacement et écriture dans un processus de rendu : mesurés ensemble
+                with document_stage_latency.time(stage='render_process'):
+                    render_pool.save(template, values, tmp_path)
+            else:
+                with document_stage_latency.time(stage='replace'):
+                    content = template.render(values)
+                with document_stage_latency.time(stage='save'):
+                    with open(tmp_path, 'wb') as f:
+                        f.write(content)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            os.remove(tmp_path)
+            raise
     
-    pdf_thread = threading.Thread(
-        target=generate_pdf_async,
-        args=(filepath, pdf_filepath)
-    )
-    pdf_thread.daemon = True
-    pdf_thread.start()
+    with document_stage_latency.time(stage='db_record'):
+        try:
+            record_documents(devis.id, filepath, pdf_filepath, key)
+        except IntegrityError:
+            # Documents enregistrés au même moment par une autre requête ou le worker de
+            # rendu : la ligne existe désormais, le second essai la met à jour
+            db.session.rollback()
+            record_documents(devis.id, filepath, pdf_filepath, key)
+    
+    if not os.path.exists(pdf_filepath):
+        queue_pdf_generation(filepath, pdf_filepath)
     
     return filepath
 
 
-def cleanup_old_files(numero_opportunite):
-    """Supprimer les anciens fichiers de documents pour un numero_opportunite donné."""
-    pattern = os.path.join(DOC_DIR, f"Proposition_commerciale_{sanitize_filename(numero_opportunite)}_*.docx")
-    old_docx_files = glob.glob(pattern)
-    
-    for old_file in old_docx_files:
-        try:
-            old_pdf = old_file.replace('.docx', '.pdf')
-            if os.path.exists(old_file):
-                os.remove(old_file)
-                logger.info(f"Ancien fichier DOCX supprimé: {old_file}")
-            if os.path.exists(old_pdf):
-                os.remove(old_pdf)
-                logger.info(f"Ancien fichier PDF supprimé: {old_pdf}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la suppression de l'ancien fichier {old_file}: {str(e)}")
+def render_devis_documents(devis_id):
+    """RenderJobQueue callback: produce the DOCX and the PDF of a devis."""
+    try:
+        with app.app_context():
+            with document_stage_latency.time(stage='db_fetch'):
+                devis = db.session.get(Devis, devis_id)
+            if devis is None:
+                return
+            docx_path = generate_docx_file(devis)
+            # Le job n'est terminé qu'une fois le PDF produit (rejoint la conversion en file)
+            with document_stage_latency.time(stage='pdf_wait'):
+                ensure_pdf_exists(docx_path)
+    except Exception:
+        render_job_results.inc(status=render_queue.FAILED)
+        raise
+    render_job_results.inc(status=render_queue.DONE)
+
+
+def on_pdf_complete(job):
+    """PdfJobQueue callback: count the conversion and record its artifacts."""
+    pdf_conversion_results.inc(status=job.status)
+    if job.started_at is not None:
+        document_stage_latency.observe(job.finished_at - job.started_at, stage='pdf_conversion')
+    for devis_id in record_pdf_artifacts(job):
+        change_notifier.document_ready({
+            'id': devis_id, 'kind': 'pdf', 'status': job.status,
+            'pdf_url': f"/api/devis/{devis_id}/pdf" if job.status == DONE else None,
+        })
+
+
+def record_pdf_artifacts(job):
+    """Record a converted PDF for every devis using its DOCX. Returns the ids of these devis."""
+    key = os.path.splitext(os.path.basename(job.pdf_path))[0]
+    with app.app_context():
+        devis_ids = db.session.execute(
+            db.select(DocumentArtifact.devis_id).where(
+                DocumentArtifact.hash == key, DocumentArtifact.kind == "docx",
+                DocumentArtifact.devis_id.is_not(None)
+            )
+        ).scalars().all()
+        if job.status != DONE:
+            return devis_ids
+        for attempt in range(2):
+            try:
+                for devis_id in devis_ids:
+                    record_artifact(devis_id, "pdf", job.pdf_path, key)
+                db.session.commit()
+                break
+            except IntegrityError:
+                # PDF enregistré au même moment par generate_docx_file : nouvel essai
+                db.session.rollback()
+                if attempt:
+                    raise
+    return devis_ids
 
 
 # Fonction de validation des données
@@ -345,6 +820,14 @@ def validate_devis_data(data, is_update=False):
     return errors
 
 
+# Champs numériques optionnels : une chaîne vide est enregistrée comme NULL
+EMPTY_TO_NULL_FIELDS = ['taux_do', 'taux_trc', 'taux_rcmo',
+                        'montant_dm', 'montant_maintenance_visite',
+                        'montant_mesures_conservatoires', 'montant_rcmo', 'montant_do',
+                        'montant_trc', 'franchise_trc', 'franchise_maintenance',
+                        'franchise_rcmo']
+
+
 def clean_empty_fields(data, fields):
     """Convertir les chaînes vides en None pour certains champs spécifiques dans le dictionnaire de données."""
     for field in fields:
@@ -353,95 +836,604 @@ def clean_empty_fields(data, fields):
     return data
 
 
-# Endpoint GET pour récupérer tous les devis
+def build_devis_fields(data):
+    """Map validated request data to Devis column values, with the creation defaults.
+
+    Premiums are computed by the pricing module, whatever the client sent.
+    """
+    fields = {
+        'numero_opportunite': data.get('numero_opportunite'),
+        'nom_client': data.get('nom_client'),
+        'type_travaux': data.get('type_travaux'),
+        'cout_ouvrage': data.get('cout_ouvrage'),
+        'presence_existant': data.get('presence_existant', False),
+        'client_vip': data.get('client_vip', False),
+        'garantie': data.get('garantie'),
+        'souhaite_rcmo': data.get('souhaite_rcmo', False),
+        'assurer_intervenants': data.get('assurer_intervenants', False),
+        'destination_ouvrage': data.get('destination_ouvrage'),
+        'adresse_chantier': data.get('adresse_chantier'),
+        'description_ouvrage': data.get('description_ouvrage'),
+        'taux_do': data.get('taux_do'),
+        'taux_trc': data.get('taux_trc'),
+        'taux_rcmo': data.get('taux_rcmo'),
+        'franchise_rcmo': data.get('franchise_rcmo', 0),
+        # Add the new fields
+        'montant_dm': data.get('montant_dm'),
+        'montant_maintenance_visite': data.get('montant_maintenance_visite'),
+        'montant_mesures_conservatoires': data.get('montant_mesures_conservatoires'),
+        'montant_rcmo': data.get('montant_rcmo'),
+        'montant_do': data.get('montant_do'),
+        'montant_trc': data.get('montant_trc'),
+        'franchise_trc': data.get('franchise_trc'),
+        'franchise_maintenance': data.get('franchise_maintenance')
+    }
+    fields.update(price_devis(fields))
+    return fields
+
+
+# Pagination par curseur (keyset) pour la liste des devis
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+SORTABLE_FIELDS = ['date_creation', 'prime_totale', 'numero_opportunite']
+
+
+def encode_cursor(sort_value, devis_id):
+    """Encode the last (sort value, id) pair of a page into an opaque cursor."""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, devis_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor, sort_field):
+    """Decode a cursor built by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        sort_value, devis_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        devis_id = int(devis_id)
+        if sort_value is not None and sort_field == 'date_creation':
+            sort_value = datetime.fromisoformat(sort_value)
+        elif sort_value is not None and sort_field == 'prime_totale':
+            sort_value = float(sort_value)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Curseur invalide")
+    return sort_value, devis_id
+
+
+def parse_list_params(args):
+    """Parse filters, sort and pagination query parameters of the list endpoint.
+
+    Returns a (params, errors) tuple, errors using the same format as validate_devis_data.
+    """
+    errors = {}
+    params = {}
+
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        if limit <= 0:
+            raise ValueError
+        params['limit'] = min(limit, MAX_PAGE_SIZE)
+    except ValueError:
+        errors['limit'] = "Le paramètre 'limit' doit être un entier positif"
+
+    params['sort'] = args.get('sort', 'date_creation')
+    if params['sort'] not in SORTABLE_FIELDS:
+        errors['sort'] = f"Tri possible uniquement sur : {', '.join(SORTABLE_FIELDS)}"
+
+    params['order'] = args.get('order', 'desc')
+    if params['order'] not in ['asc', 'desc']:
+        errors['order'] = "L'ordre doit être 'asc' ou 'desc'"
+
+    params['cursor'] = None
+    if args.get('cursor') and 'sort' not in errors:
+        try:
+            params['cursor'] = decode_cursor(args['cursor'], params['sort'])
+        except ValueError as e:
+            errors['cursor'] = str(e)
+
+    params['fields'], unknown_fields = devis_serializer.parse_fields(args.get('fields'))
+    if unknown_fields:
+        errors['fields'] = f"Champs inconnus : {', '.join(unknown_fields)}"
+
+    params['garantie'] = args.get('garantie') or None
+
+    client_vip = args.get('client_vip', '')
+    if client_vip in ['true', 'false']:
+        params['client_vip'] = client_vip == 'true'
+    elif client_vip:
+        errors['client_vip'] = "Le filtre 'client_vip' doit être 'true' ou 'false'"
+
+    for field in ['date_creation_min', 'date_creation_max']:
+        if args.get(field):
+            try:
+                params[field] = datetime.strptime(args[field], '%Y-%m-%d')
+            except ValueError:
+                errors[field] = f"Le filtre '{field}' doit être une date au format AAAA-MM-JJ"
+
+    for field in ['prime_min', 'prime_max']:
+        if args.get(field):
+            try:
+                params[field] = float(args[field])
+            except ValueError:
+                errors[field] = f"Le filtre '{field}' doit être un nombre valide"
+
+    return params, errors
+
+
+def apply_list_filters(query, params):
+    """Apply the list filters of `params` to a Query or a select() statement."""
+    if params['garantie']:
+        query = query.filter(Devis.garantie == params['garantie'])
+    if 'client_vip' in params:
+        query = query.filter(Devis.client_vip == params['client_vip'])
+    if 'date_creation_min' in params:
+        query = query.filter(Devis.date_creation >= params['date_creation_min'])
+    if 'date_creation_max' in params:
+        # Borne incluse : tout le jour de la date maximum
+        query = query.filter(Devis.date_creation < params['date_creation_max'] + timedelta(days=1))
+    if 'prime_min' in params:
+        query = query.filter(Devis.prime_totale >= params['prime_min'])
+    if 'prime_max' in params:
+        query = query.filter(Devis.prime_totale <= params['prime_max'])
+    return query
+
+
+def build_devis_list_query(params, columns):
+    """Build the filtered, keyset-paginated select() of `columns` for the list endpoint."""
+    query = apply_list_filters(db.select(*columns), params)
+
+    sort_column = getattr(Devis, params['sort'])
+    descending = params['order'] == 'desc'
+
+    # Les valeurs NULL sont toujours placées en fin de liste
+    if params['cursor'] is not None:
+        last_value, last_id = params['cursor']
+        id_after = Devis.id < last_id if descending else Devis.id > last_id
+        if last_value is None:
+            query = query.filter(sort_column.is_(None), id_after)
+        else:
+            value_after = sort_column < last_value if descending else sort_column > last_value
+            query = query.filter(db.or_(
+                value_after,
+                db.and_(sort_column == last_value, id_after),
+                sort_column.is_(None)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc().nulls_last(), Devis.id.desc())
+    else:
+        query = query.order_by(sort_column.asc().nulls_last(), Devis.id.asc())
+
+    return query
+
+
+# Endpoint GET pour récupérer les devis (filtrés, triés et paginés)
 @app.route('/api/devis', methods=['GET'])
 def get_devis():
-    devis = Devis.query.all()
-    return jsonify([serialize_devis(d) for d in devis])
+    params, errors = parse_list_params(request.args)
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+
+    def build():
+        # Version lue avant la page : une écriture concurrente sera renvoyée par /changes
+        version = head_version(db.session, DevisChangeCounter.__table__)
+        # Lecture de tuples (sans objets ORM) limitée aux colonnes demandées,
+        # plus celles nécessaires au curseur
+        columns = devis_serializer.columns(params['fields'], extra=[params['sort'], 'id'])
+        serialize = devis_serializer.row_serializer(params['fields'], columns)
+        
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        rows = db.session.execute(
+            build_devis_list_query(params, columns).limit(params['limit'] + 1)
+        ).all()
+        has_more = len(rows) > params['limit']
+        rows = rows[:params['limit']]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]._mapping
+            next_cursor = encode_cursor(last[params['sort']], last['id'])
+
+        return dumps({
+            'items': [serialize(row) for row in rows],
+            'next_cursor': next_cursor,
+            'limit': params['limit'],
+            'version': version
+        }), None
+
+    return cached_json_response(f"list:{request.query_string.decode('latin-1')}", build)
+
+
+# Endpoint GET pour la recherche plein texte (numéro, client, adresse, description)
+@app.route('/api/devis/search', methods=['GET'])
+def search_devis():
+    params, errors = parse_list_params(request.args)
+    terms = search_terms(request.args.get('q'))
+    if not terms:
+        errors['q'] = "Le paramètre 'q' doit contenir au moins un mot"
+    try:
+        offset = int(request.args.get('offset', 0))
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        errors['offset'] = "Le paramètre 'offset' doit être un entier positif ou nul"
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+    
+    columns = devis_serializer.columns(params['fields'])
+    serialize = devis_serializer.row_serializer(params['fields'], columns)
+    statement = search_statement(db.engine.dialect.name, Devis.__table__, columns, terms)
+    # Une ligne de plus pour savoir s'il existe d'autres résultats
+    rows = db.session.execute(
+        apply_list_filters(statement, params).limit(params['limit'] + 1).offset(offset)
+    ).all()
+    has_more = len(rows) > params['limit']
+    rows = rows[:params['limit']]
+    
+    return Response(dumps({
+        'items': [{**serialize(row), 'score': round(row.score, 4)} for row in rows],
+        'next_offset': offset + params['limit'] if has_more else None,
+        'limit': params['limit']
+    }), mimetype='application/json')
+
+
+# Export complet en flux : lignes lues par lots avec un curseur serveur
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def iter_devis_export(params, export_format, delimiter=','):
+    """Yield the filtered devis table as NDJSON lines or CSV chunks, one batch at a time."""
+    columns = devis_serializer.columns(params['fields'])
+    serialize = devis_serializer.row_serializer(params['fields'], columns)
+    statement = apply_list_filters(db.select(*columns), params).order_by(Devis.id) \
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    result = db.session.execute(statement)
+
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=params['fields'], delimiter=delimiter)
+        writer.writeheader()
+        # BOM pour qu'Excel détecte l'UTF-8
+        yield '\ufeff' + buffer.getvalue()
+        for partition in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(serialize(row) for row in partition)
+            yield buffer.getvalue()
+    else:
+        for partition in result.partitions():
+            yield b''.join(dumps(serialize(row)) + b'\n' for row in partition)
+
+
+# Endpoint GET pour exporter tous les devis (NDJSON ou CSV) en mémoire constante
+@app.route('/api/devis/export', methods=['GET'])
+def export_devis():
+    params, errors = parse_list_params(request.args)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        errors['format'] = f"Format possible : {', '.join(EXPORT_FORMATS)}"
+    delimiter = request.args.get('delimiter', ',')
+    if delimiter not in [',', ';']:
+        errors['delimiter'] = "Le séparateur doit être ',' ou ';'"
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+
+    filename = f"devis_{datetime.now(timezone.utc).strftime('%Y%m%d')}.{export_format}"
+    return Response(
+        stream_with_context(iter_devis_export(params, export_format, delimiter)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+# Synchronisation incrémentale : modifications des devis depuis une version
+CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 5000
+# Intervalle des messages de maintien de connexion du flux d'événements (secondes)
+CHANGES_HEARTBEAT = int(os.environ.get('CHANGES_HEARTBEAT', 15))
+
+
+def parse_changes_params(args, since=None):
+    """Parse the since, limit and fields parameters of the change feed. Returns (params, errors)."""
+    errors = {}
+    params = {}
+    try:
+        params['since'] = int(since if since is not None else args.get('since', 0))
+        if params['since'] < 0:
+            raise ValueError
+    except ValueError:
+        errors['since'] = "Le paramètre 'since' doit être une version (entier positif)"
+    try:
+        limit = int(args.get('limit', CHANGES_PAGE_SIZE))
+        if limit <= 0:
+            raise ValueError
+        params['limit'] = min(limit, MAX_CHANGES_PAGE_SIZE)
+    except ValueError:
+        errors['limit'] = "Le paramètre 'limit' doit être un entier positif"
+    params['fields'], unknown_fields = devis_serializer.parse_fields(args.get('fields'))
+    if unknown_fields:
+        errors['fields'] = f"Champs inconnus : {', '.join(unknown_fields)}"
+    return params, errors
+
+
+def load_changes(connection, since, fields, limit):
+    """Serialized changes after `since`: (changes, has_more).
+
+    A change is {'version', 'id', 'deleted', 'devis'}, 'devis' being None for a deletion.
+    """
+    changes_table = DevisChange.__table__
+    columns = devis_serializer.columns(fields)
+    serialize = devis_serializer.row_serializer(
+        fields, [changes_table.c.version, changes_table.c.devis_id, changes_table.c.deleted, *columns]
+    )
+    rows, has_more = read_changes(connection, changes_table, Devis.__table__, columns, since, limit)
+    changes = [
+        {'version': row.version, 'id': row.devis_id, 'deleted': row.deleted,
+         'devis': None if row.deleted else serialize(row)}
+        for row in rows
+    ]
+    return changes, has_more
+
+
+def unknown_version_response(since, head):
+    """410 response to a `since` beyond the current version `head`."""
+    # Base réinitialisée depuis la dernière synchronisation du client
+    return jsonify({
+        'error': 'Version inconnue : resynchronisation complète nécessaire',
+        'details': {'since': since, 'version': head}
+    }), 410
+
+
+# Endpoint GET des devis créés, modifiés ou supprimés depuis une version
+@app.route('/api/devis/changes', methods=['GET'])
+def get_devis_changes():
+    params, errors = parse_changes_params(request.args)
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+
+    with db.engine.connect() as connection:
+        head = head_version(connection, DevisChangeCounter.__table__)
+        if params['since'] > head:
+            return unknown_version_response(params['since'], head)
+        changes, has_more = load_changes(connection, params['since'], params['fields'], params['limit'])
+
+    return Response(dumps({
+        'changes': changes,
+        'cursor': changes[-1]['version'] if changes else params['since'],
+        'has_more': has_more,
+        'version': head
+    }), mimetype='application/json')
+
+
+def iter_change_events(since, fields):
+    """Server-sent events of the changes after `since`, then of the new ones as they happen.
+
+    'change' events carry a change of the feed (its version as event id), 'document'
+    events a finished render or PDF conversion of this process.
+    """
+    # Délai de reconnexion d'EventSource (ms)
+    yield b'retry: 5000\n\n'
+    sequence = change_notifier.sequence
+    seen_documents = sequence
+    while True:
+        # Connexion rendue après chaque lecture : pas de transaction ouverte entre deux réveils
+        has_more = True
+        while has_more:
+            with db.engine.connect() as connection:
+                changes, has_more = load_changes(connection, since, fields, CHANGES_PAGE_SIZE)
+            for change in changes:
+                yield format_event('change', change, event_id=change['version'])
+            if changes:
+                since = changes[-1]['version']
+        for seen_documents, event in change_notifier.documents_since(seen_documents):
+            yield format_event('document', event)
+
+        new_sequence = change_notifier.wait(sequence, CHANGES_HEARTBEAT)
+        if new_sequence == sequence:
+            # Rien de nouveau dans ce processus : maintien de la connexion, puis relecture
+            # de la table pour les écritures faites par d'autres processus
+            yield b': keepalive\n\n'
+        sequence = new_sequence
+
+
+# Endpoint GET du flux d'événements (server-sent events) des modifications des devis
+@app.route('/api/devis/changes/stream', methods=['GET'])
+def stream_devis_changes():
+    # EventSource renvoie la dernière version reçue à la reconnexion
+    params, errors = parse_changes_params(request.args, since=request.headers.get('Last-Event-ID'))
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+    # Sinon le flux attendrait sans fin une version déjà dépassée ; EventSource ne se
+    # reconnecte pas après une erreur et le client recharge tout
+    with db.engine.connect() as connection:
+        head = head_version(connection, DevisChangeCounter.__table__)
+    if params['since'] > head:
+        return unknown_version_response(params['since'], head)
+    return Response(
+        stream_with_context(iter_change_events(params['since'], params['fields'])),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 
 # Endpoint GET pour récupérer un devis spécifique
 @app.route('/api/devis/<int:devis_id>', methods=['GET'])
 def get_devis_detail(devis_id):
-    devis = Devis.query.get_or_404(devis_id)
-    return jsonify(serialize_devis(devis))
+    def build():
+        devis = Devis.query.get_or_404(devis_id)
+        body = dumps({**serialize_devis(devis), 'render_status': get_render_status(devis_id)})
+        # Pas de Last-Modified : render_status change sans modifier le devis, seul l'ETag
+        # (empreinte de la réponse) le reflète
+        return body, None
+
+    return cached_json_response(f"detail:{devis_id}", build)
 
 # Endpoint POST pour créer un nouveau devis
 @app.route('/api/devis', methods=['POST'])
 def create_devis():
     data = request.json
-    logger.info(f"Données reçues: {data}")
     
     # Validation des données
     validation_errors = validate_devis_data(data)
     if validation_errors:
-        logger.info(f"Erreurs de validation: {validation_errors}")
+        logger.info(f"Erreurs de validation: {validation_errors}", extra=SAMPLED)
         return jsonify({
             'error': 'Erreurs de validation',
             'details': validation_errors
         }), 400
     
     # Clean empty fields - ajouter franchise_rcmo à la liste des champs à nettoyer
-    data = clean_empty_fields(data, ['taux_do', 'taux_trc', 'taux_rcmo', 
-                                    'montant_dm', 'montant_maintenance_visite', 
-                                    'montant_mesures_conservatoires', 'montant_rcmo', 'montant_do',
-                                    'montant_trc', 'franchise_trc', 'franchise_maintenance', 
-                                    'franchise_rcmo'])  # <- Ajouté franchise_rcmo ici
+    data = clean_empty_fields(data, EMPTY_TO_NULL_FIELDS)
     
 
     
     try:
-        devis = Devis(
-            numero_opportunite=data.get('numero_opportunite'),
-            nom_client=data.get('nom_client'),
-            type_travaux=data.get('type_travaux'),
-            cout_ouvrage=data.get('cout_ouvrage'),
-            presence_existant=data.get('presence_existant', False),
-            client_vip=data.get('client_vip', False),
-            garantie=data.get('garantie'),
-            souhaite_rcmo=data.get('souhaite_rcmo', False),
-            assurer_intervenants=data.get('assurer_intervenants', False),
-            destination_ouvrage=data.get('destination_ouvrage'),
-            adresse_chantier=data.get('adresse_chantier'),
-            description_ouvrage=data.get('description_ouvrage'),
-            taux_do=data.get('taux_do'),
-            taux_trc=data.get('taux_trc'),
-            taux_rcmo=data.get('taux_rcmo'),
-            franchise_rcmo=data.get('franchise_rcmo', 0),
-            prime_do=data.get('prime_do', 0),
-            prime_trc=data.get('prime_trc', 0),
-            prime_rcmo=data.get('prime_rcmo', 0),
-            prime_totale=data.get('prime_totale', 0),
-            # Add the new fields
-            montant_dm=data.get('montant_dm'),
-            montant_maintenance_visite=data.get('montant_maintenance_visite'),
-            montant_mesures_conservatoires=data.get('montant_mesures_conservatoires'),
-            montant_rcmo=data.get('montant_rcmo'),
-            montant_do=data.get('montant_do'),
-            montant_trc=data.get('montant_trc'),
-            franchise_trc=data.get('franchise_trc'),
-            franchise_maintenance=data.get('franchise_maintenance')
-        )
+        devis = Devis(**build_devis_fields(data))
         db.session.add(devis)
+        db.session.flush()
+        rollups.apply(db.session, DevisRollup.__table__, rollups.contributions([column_values(devis)]))
+        # Les documents sont produits en arrière-plan : la réponse n'attend que le commit
+        render_queue.enqueue(db.session, RenderJob.__table__, [devis.id])
         db.session.commit()
+        devis_changed()
+        render_jobs.notify()
+        logger.info(f"Devis {devis.id} créé ({devis.numero_opportunite})", extra=SAMPLED)
         
-        # Nettoyer les anciens fichiers avant de générer le nouveau
-        cleanup_old_files(devis.numero_opportunite)
-        
-        # Générer automatiquement le DOCX après la création
-        generate_docx_file(devis.id)
-        
-        return jsonify({'message': 'Devis créé avec succès', 'id': devis.id}), 201
+        return jsonify({'message': 'Devis créé avec succès', 'id': devis.id,
+                        'render_status': render_queue.PENDING}), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la création du devis : {str(e)}")
         return jsonify({'error': f"Erreur lors de la création du devis : {str(e)}"}), 500
 
 
+# Import en masse : taille des transactions d'insertion
+BULK_CHUNK_SIZE = 500
+BOOLEAN_FIELDS = [c.name for c in Devis.__table__.columns if isinstance(c.type, db.Boolean)]
+FLOAT_FIELDS = [c.name for c in Devis.__table__.columns if isinstance(c.type, db.Float)]
+TEXT_FIELDS = [c.name for c in Devis.__table__.columns if isinstance(c.type, db.String)]
+
+
+def insert_devis_chunk(chunk, results):
+    """Insert a chunk of (row_number, fields) in one transaction. Returns the new ids."""
+    try:
+        inserted = db.session.execute(
+            db.insert(Devis).returning(Devis.id, Devis.date_creation, sort_by_parameter_order=True),
+            [fields for _, fields in chunk]
+        ).all()
+        ids = [devis_id for devis_id, _ in inserted]
+        rollups.apply(db.session, DevisRollup.__table__, rollups.contributions(
+            {**fields, 'date_creation': date_creation}
+            for (_, fields), (_, date_creation) in zip(chunk, inserted)
+        ))
+        render_queue.enqueue(db.session, RenderJob.__table__, ids)
+        db.session.commit()
+        devis_changed()
+    except Exception as e:
+        db.session.rollback()
+        if len(chunk) > 1:
+            # Lot refusé par la base : lignes réinsérées une à une pour isoler les fautives
+            logger.warning(f"Erreur lors de l'import d'un lot de {len(chunk)} devis, "
+                           f"insertion ligne par ligne : {str(e)}")
+            ids = []
+            for row in chunk:
+                ids += insert_devis_chunk([row], results)
+            return ids
+        row_number = chunk[0][0]
+        logger.error(f"Erreur lors de l'import de la ligne {row_number} : {str(e)}")
+        # Le message de la base (requête, paramètres) reste dans le journal
+        results.append({'row': row_number, 'status': 'error',
+                        'details': {'base': "Erreur lors de l'insertion du devis"}})
+        return []
+    for (row_number, _), devis_id in zip(chunk, ids):
+        results.append({'row': row_number, 'status': 'created', 'id': devis_id})
+    return ids
+
+
+# Endpoint POST pour importer des devis en masse (CSV ou JSON Lines)
+@app.route('/api/devis/bulk', methods=['POST'])
+def bulk_create_devis():
+    input_format = detect_format(request.mimetype, request.args.get('format'))
+    if input_format is None:
+        return jsonify({
+            'error': "Format non supporté : envoyer du CSV (text/csv) ou du JSON Lines (application/x-ndjson)"
+        }), 415
+    
+    started = time.perf_counter()
+    rows = iter_csv_rows(request.stream) if input_format == 'csv' else iter_jsonl_rows(request.stream)
+    results = []
+    created_ids = []
+    chunk = []
+    total = 0
+    
+    for row_number, data, errors in rows:
+        total += 1
+        if data is not None:
+            errors = {}
+            if input_format == 'csv':
+                data, errors = coerce_csv_row(data, BOOLEAN_FIELDS, FLOAT_FIELDS)
+            else:
+                # Une valeur du mauvais type ferait échouer l'insertion de tout le lot
+                data, errors = coerce_json_row(data, BOOLEAN_FIELDS, FLOAT_FIELDS, TEXT_FIELDS)
+            errors = {**validate_devis_data(data), **errors}
+        if errors:
+            results.append({'row': row_number, 'status': 'error', 'details': errors})
+            continue
+        
+        data = clean_empty_fields(data, EMPTY_TO_NULL_FIELDS)
+        chunk.append((row_number, build_devis_fields(data)))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            created_ids += insert_devis_chunk(chunk, results)
+            chunk = []
+    
+    if chunk:
+        created_ids += insert_devis_chunk(chunk, results)
+    
+    # Les documents sont produits en arrière-plan, après la réponse
+    if created_ids:
+        render_jobs.notify()
+    
+    duration = time.perf_counter() - started
+    results.sort(key=lambda result: result['row'])
+    logger.info(f"Import en masse : {len(created_ids)}/{total} devis créés en {duration:.2f} s")
+    
+    return jsonify({
+        'total': total,
+        'created': len(created_ids),
+        'failed': total - len(created_ids),
+        'duration_seconds': round(duration, 3),
+        'rows_per_second': round(total / duration, 1) if duration > 0 else None,
+        'results': results
+    }), 200
+
+
 # Endpoint PATCH pour modifier un devis existant
 @app.route('/api/devis/<int:devis_id>', methods=['PATCH'])
 def update_devis(devis_id):
     data = request.json
-    devis = Devis.query.get_or_404(devis_id)
+    # Verrou d'écriture (SQLite) ou de ligne (PostgreSQL) avant de lire le devis : les totaux
+    # retirent son ancienne contribution, qui ne doit pas changer avant le commit
+    begin_write(db.session)
+    devis = db.get_or_404(Devis, devis_id, with_for_update=True)
     
     # Validation des données pour la mise à jour
     validation_errors = validate_devis_data(data, is_update=True)
@@ -456,7 +1448,6 @@ def update_devis(devis_id):
         'cout_ouvrage', 'presence_existant', 'client_vip', 'garantie',
         'souhaite_rcmo', 'assurer_intervenants', 'destination_ouvrage', 'adresse_chantier',
         'description_ouvrage', 'taux_do', 'taux_trc', 'taux_rcmo', 'franchise_rcmo',
-        'prime_do', 'prime_trc', 'prime_rcmo', 'prime_totale',
         # Add the new fields
         'montant_dm', 'montant_maintenance_visite', 'montant_mesures_conservatoires', 
         'montant_rcmo', 'montant_do', 'montant_trc',
@@ -464,67 +1455,385 @@ def update_devis(devis_id):
     ]
     
     # Clean empty fields - add the new fields to be cleaned
-    data = clean_empty_fields(data, ['taux_do', 'taux_trc', 'taux_rcmo', 
-                                    'montant_dm', 'montant_maintenance_visite', 
-                                    'montant_mesures_conservatoires', 'montant_rcmo', 'montant_do',
-                                    'montant_trc', 'franchise_trc', 'franchise_maintenance',
-                                    'franchise_rcmo'])  # Ajouté franchise_rcmo ici
+    data = clean_empty_fields(data, EMPTY_TO_NULL_FIELDS)
     
     
     try:
+        previous_values = column_values(devis)
         for field in allowed_fields:
             if field in data:
                 setattr(devis, field, data[field])
+        # Recalculer les primes à partir des taux et garanties mis à jour
+        for field, value in price_devis(column_values(devis)).items():
+            setattr(devis, field, value)
         # Mettre à jour la date de modification
         devis.date_creation = datetime.now(timezone.utc)
+        rollups.apply(db.session, DevisRollup.__table__, rollups.merge(
+            rollups.contributions([previous_values], sign=-1),
+            rollups.contributions([column_values(devis)])
+        ))
+        # Documents régénérés en arrière-plan (sans rendu si rien n'a changé) ;
+        # l'ancien document est supprimé plus tard par le ramasse-miettes
+        render_queue.enqueue(db.session, RenderJob.__table__, [devis.id])
         db.session.commit()
+        devis_changed()
+        render_jobs.notify()
         
-        # Nettoyer les anciens fichiers avant de générer le nouveau
-        cleanup_old_files(devis.numero_opportunite)
-        
-        # Générer automatiquement le DOCX après la mise à jour
-        generate_docx_file(devis.id)
-        
-        return jsonify({'message': 'Devis mis à jour avec succès'})
+        return jsonify({'message': 'Devis mis à jour avec succès',
+                        'render_status': render_queue.PENDING})
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la mise à jour : {str(e)}")
         return jsonify({'error': f"Erreur lors de la mise à jour : {str(e)}"}), 500
 
 
+def enqueue_all_documents():
+    """Request the rendering of every devis, e.g. after a template change. Returns the count."""
+    devis_ids = db.session.execute(db.select(Devis.id).order_by(Devis.id)).scalars().all()
+    for start in range(0, len(devis_ids), BULK_CHUNK_SIZE):
+        render_queue.enqueue(db.session, RenderJob.__table__, devis_ids[start:start + BULK_CHUNK_SIZE])
+        db.session.commit()
+    response_cache.invalidate()
+    render_jobs.notify()
+    logger.info(f"Régénération demandée pour {len(devis_ids)} devis")
+    return len(devis_ids)
+
+
+# Endpoint POST pour régénérer les documents de tous les devis (après un changement de template)
+@app.route('/api/documents/regenerate', methods=['POST'])
+def regenerate_documents():
+    try:
+        count = enqueue_all_documents()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de la demande de régénération : {str(e)}")
+        return jsonify({'error': f"Erreur lors de la demande de régénération : {str(e)}"}), 500
+    return jsonify({'queued': count, 'render_workers': RENDER_WORKERS,
+                    'render_processes': render_pool.workers if render_pool else None}), 202
+
+
+@app.cli.command('regenerate-documents')
+def regenerate_documents_command():
+    """Request the rendering of the documents of every devis."""
+    print(f"Régénération demandée pour {enqueue_all_documents()} devis")
+
+
+def parse_stats_params(args):
+    """Parse the group_by and filter parameters of the statistics endpoint.
+
+    Returns a (group_by, filters, errors) tuple.
+    """
+    errors = {}
+    group_by = [name.strip() for name in args.get('group_by', 'garantie').split(',') if name.strip()]
+    unknown = [name for name in group_by if name not in rollups.ROLLUP_DIMENSIONS]
+    if unknown:
+        errors['group_by'] = f"Regroupement possible par : {', '.join(rollups.ROLLUP_DIMENSIONS)}"
+
+    filters = {}
+    for name in rollups.TEXT_DIMENSIONS:
+        if args.get(name):
+            filters[name] = args[name]
+    client_vip = args.get('client_vip', '')
+    if client_vip in ['true', 'false']:
+        filters['client_vip'] = client_vip == 'true'
+    elif client_vip:
+        errors['client_vip'] = "Le filtre 'client_vip' doit être 'true' ou 'false'"
+    for name in ['month', 'month_min', 'month_max']:
+        if args.get(name):
+            if not re.fullmatch(r'\d{4}-\d{2}', args[name]):
+                errors[name] = f"Le filtre '{name}' doit être un mois au format AAAA-MM"
+            filters[name] = args[name]
+    return group_by, filters, errors
+
+
+# Endpoint GET pour les totaux des primes regroupés (garantie, type de travaux, mois...)
+@app.route('/api/stats/primes', methods=['GET'])
+def get_premium_stats():
+    group_by, filters, errors = parse_stats_params(request.args)
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+    
+    groups, totals = rollups.aggregate(db.session, DevisRollup.__table__, group_by, filters)
+    return jsonify({'group_by': group_by, 'groups': groups, 'totals': totals})
+
+
+# Colonnes du portefeuille gardées en mémoire pour les simulations de taux
+PORTFOLIO_COLUMNS = ['cout_ouvrage', 'taux_do', 'taux_trc', 'taux_rcmo'] + list(SCENARIO_CRITERIA)
+_portfolio_cache = {'version': None, 'portfolio': None}
+_portfolio_lock = threading.Lock()
+
+
+def load_portfolio():
+    """Return the Portfolio of all devis, reloaded only when the table has changed.
+
+    Rows are never deleted and every update resets date_creation, so the row count,
+    the last id and the last date_creation identify a version of the table.
+    """
+    version = tuple(db.session.execute(db.select(
+        db.func.count(Devis.id), db.func.max(Devis.id), db.func.max(Devis.date_creation)
+    )).one())
+    with _portfolio_lock:
+        if _portfolio_cache['version'] != version:
+            rows = db.session.execute(
+                db.select(*[getattr(Devis, name) for name in PORTFOLIO_COLUMNS])
+            ).all()
+            _portfolio_cache['portfolio'] = Portfolio.from_rows(rows, PORTFOLIO_COLUMNS)
+            _portfolio_cache['version'] = version
+        return _portfolio_cache['portfolio']
+
+
+# Endpoint POST pour recalculer tout le portefeuille sous des scénarios de taux
+@app.route('/api/pricing/scenarios', methods=['POST'])
+def reprice_portfolio():
+    data = request.json or {}
+    scenarios = data.get('scenarios')
+    
+    validation_errors = validate_scenarios(scenarios)
+    if validation_errors:
+        return jsonify({
+            'error': 'Erreurs de validation',
+            'details': validation_errors
+        }), 400
+    
+    started = time.perf_counter()
+    portfolio = load_portfolio()
+    
+    baseline = portfolio.price()
+    base_totals = summarize(baseline)
+    results = []
+    for i, scenario in enumerate(scenarios):
+        premiums = portfolio.reprice(scenario['adjustments'])
+        totals = summarize(premiums)
+        changed = int((abs(premiums['prime_totale'] - baseline['prime_totale']) > 1e-9).sum())
+        results.append({
+            'name': scenario.get('name', f"Scénario {i + 1}"),
+            'totals': totals,
+            'delta': {field: round(totals[field] - base_totals[field], 2) for field in PREMIUM_FIELDS},
+            'delta_percent': round(
+                (totals['prime_totale'] - base_totals['prime_totale']) / base_totals['prime_totale'] * 100, 4
+            ) if base_totals['prime_totale'] else None,
+            'devis_impactes': changed
+        })
+    
+    return jsonify({
+        'count': portfolio.size,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        'baseline': base_totals,
+        'scenarios': results
+    })
+
+
 # Endpoint GET pour télécharger le DOCX existant
 @app.route('/api/devis/<int:devis_id>/docx', methods=['GET'])
 def get_docx(devis_id):
-    devis = Devis.query.get_or_404(devis_id)
-    date_local = to_paris_time(devis.date_creation)
-    filename = generate_filename(devis.numero_opportunite, date_local, "docx")
-    filepath = os.path.join(DOC_DIR, filename)
-    if not os.path.exists(filepath):
-        filepath = generate_docx_file(devis_id)
-    return send_file(filepath, as_attachment=True)
+    # Document courant en cache : ni requête SQL ni, si le client l'a déjà (ETag), transfert
+    document = response_cache.get(f"docx:{devis_id}")
+    if document is None:
+        generation = response_cache.generation
+        devis = Devis.query.get_or_404(devis_id)
+        filepath = current_docx_path(devis)
+        key = os.path.splitext(os.path.basename(filepath))[0]
+        document = (filepath, key, last_modified_of(devis), get_download_name(devis, "docx"))
+        response_cache.set(f"docx:{devis_id}", document, generation)
+    return document_response(document)
 
 
 # Endpoint GET pour générer un fichier PDF pour un devis spécifique
 @app.route('/api/devis/<int:devis_id>/pdf', methods=['GET'])
 def generate_pdf(devis_id):
-    devis = Devis.query.get_or_404(devis_id)
-    date_local = to_paris_time(devis.date_creation)
-    docx_filename = generate_filename(devis.numero_opportunite, date_local, "docx")
-    docx_path = os.path.join(DOC_DIR, docx_filename)
+    document = response_cache.get(f"pdf:{devis_id}")
+    if document is not None:
+        return document_response(document)
     
+    generation = response_cache.generation
+    devis = Devis.query.get_or_404(devis_id)
     # Générer le DOCX si besoin
-    if not os.path.exists(docx_path):
-        docx_path = generate_docx_file(devis_id)
+    docx_path = current_docx_path(devis)
+    
+    # ?wait=false : ne pas bloquer, le client suit la conversion via /pdf/status
+    if request.args.get('wait') in ['0', 'false']:
+        pdf_path = docx_path.replace('.docx', '.pdf')
+        if not os.path.exists(pdf_path):
+            try:
+                job = pdf_queue.submit(docx_path, pdf_path)
+            except PdfQueueFullError as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
+            status_url = f"/api/devis/{devis_id}/pdf/status"
+            return jsonify({'status': job.status, 'status_url': status_url}), 202, {'Location': status_url}
     
     try:
         # Utiliser la fonction commune pour garantir l'existence du PDF
         pdf_path = ensure_pdf_exists(docx_path)
-        return send_file(pdf_path, as_attachment=True)
+        key = os.path.splitext(os.path.basename(pdf_path))[0]
+        document = (pdf_path, key, last_modified_of(devis), get_download_name(devis, "pdf"))
+        response_cache.set(f"pdf:{devis_id}", document, generation)
+        return document_response(document)
+    except PdfQueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
     except Exception as e:
         return jsonify({'error': f"Erreur lors de la génération du PDF: {str(e)}"}), 500
 
 
+# Endpoint GET pour suivre la génération du PDF d'un devis
+@app.route('/api/devis/<int:devis_id>/pdf/status', methods=['GET'])
+def get_pdf_status(devis_id):
+    devis = Devis.query.get_or_404(devis_id)
+    pdf_path = get_docx_path(devis).replace('.docx', '.pdf')
+    
+    job = pdf_queue.get(pdf_path)
+    if os.path.exists(pdf_path):
+        status = {'status': DONE, 'error': None}
+    elif job is not None and job.status != DONE:
+        status = job.to_dict()
+    else:
+        status = {'status': 'missing', 'error': None}
+    
+    status['pdf_url'] = f"/api/devis/{devis_id}/pdf" if status['status'] == DONE else None
+    status['queue_depth'] = pdf_queue.depth
+    return jsonify(status)
+
+
+# Archive ZIP des documents de plusieurs devis
+BUNDLE_FORMATS = {'pdf': ['pdf'], 'docx': ['docx'], 'both': ['docx', 'pdf']}
+BUNDLE_MAX_DEVIS = int(os.environ.get('BUNDLE_MAX_DEVIS', 1000))
+# Devis préparés en parallèle (rendu DOCX, attente de la conversion PDF)
+BUNDLE_WORKERS = int(os.environ.get('BUNDLE_WORKERS', 4))
+
+
+def bundle_documents(devis_id, kinds):
+    """Archive names and paths of the `kinds` documents of a devis, produced if missing.
+
+    Runs in a bundle worker thread. Returns a list of (name, path) pairs.
+    """
+    with app.app_context():
+        devis = db.session.get(Devis, devis_id)
+        if devis is None:
+            raise LookupError("devis supprimé")
+        paths = {'docx': current_docx_path(devis)}
+        if 'pdf' in kinds:
+            deadline = time.monotonic() + PDF_WAIT_TIMEOUT
+            while True:
+                try:
+                    paths['pdf'] = ensure_pdf_exists(paths['docx'])
+                    break
+                except PdfQueueFullError:
+                    # File de conversion occupée par d'autres demandes : attendre une place
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(1)
+        # Préfixe de l'id : deux devis peuvent avoir le même nom de téléchargement
+        return [(f"{devis_id}_{get_download_name(devis, kind)}", paths[kind]) for kind in kinds]
+
+
+def iter_bundle_files(devis_ids, kinds):
+    """Yield the (name, path) pairs of the documents of `devis_ids` as each devis is ready.
+
+    At most 2 * BUNDLE_WORKERS devis are prepared ahead of the archive. The devis whose
+    documents could not be produced are listed in erreurs.txt at the end of the archive.
+    """
+    errors = []
+    remaining = iter(devis_ids)
+    executor = ThreadPoolExecutor(max_workers=BUNDLE_WORKERS, thread_name_prefix='bundle')
+    futures = {}
+
+    def submit_next():
+        devis_id = next(remaining, None)
+        if devis_id is not None:
+            futures[executor.submit(bundle_documents, devis_id, kinds)] = devis_id
+
+    try:
+        for _ in range(2 * BUNDLE_WORKERS):
+            submit_next()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                devis_id = futures.pop(future)
+                submit_next()
+                try:
+                    files = future.result()
+                except Exception as e:
+                    logger.error(f"Documents du devis {devis_id} non inclus dans l'archive : {str(e)}")
+                    errors.append(f"Devis {devis_id} : {str(e)}")
+                    continue
+                yield from files
+    finally:
+        # Client déconnecté : les devis pas encore commencés ne sont pas préparés
+        executor.shutdown(wait=False, cancel_futures=True)
+    if errors:
+        yield 'erreurs.txt', ('\n'.join(errors) + '\n').encode('utf-8')
+
+
+def parse_bundle_ids(value):
+    """Devis ids of a bundle request: a list of integers or a comma-separated string."""
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    if not isinstance(value, list):
+        raise ValueError
+    ids = [int(item) for item in value]
+    # Doublons retirés, ordre conservé
+    return list(dict.fromkeys(ids))
+
+
+# Endpoint pour télécharger les documents de plusieurs devis dans une archive ZIP
+@app.route('/api/devis/bundle', methods=['GET', 'POST'])
+def bundle_devis():
+    """ZIP of the documents of the devis given by `ids`, or else matching the list filters.
+
+    The archive is streamed as documents become ready; missing ones are produced in parallel.
+    """
+    body = request.get_json(silent=True) if request.method == 'POST' else None
+    if not isinstance(body, dict):
+        body = {}
+    params, errors = parse_list_params(request.args)
+    
+    bundle_format = body.get('format', request.args.get('format', 'pdf'))
+    if bundle_format not in BUNDLE_FORMATS:
+        errors['format'] = f"Format possible : {', '.join(BUNDLE_FORMATS)}"
+    
+    devis_ids = None
+    raw_ids = body.get('ids', request.args.get('ids'))
+    if raw_ids is not None:
+        try:
+            devis_ids = parse_bundle_ids(raw_ids)
+        except (ValueError, TypeError):
+            errors['ids'] = "Le paramètre 'ids' doit être une liste d'identifiants entiers"
+    if errors:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': errors
+        }), 400
+    
+    if devis_ids is None:
+        devis_ids = db.session.execute(
+            apply_list_filters(db.select(Devis.id), params).order_by(Devis.id).limit(BUNDLE_MAX_DEVIS + 1)
+        ).scalars().all()
+    if len(devis_ids) > BUNDLE_MAX_DEVIS:
+        return jsonify({
+            'error': 'Paramètres invalides',
+            'details': {'ids': f"Au plus {BUNDLE_MAX_DEVIS} devis par archive"}
+        }), 400
+    
+    existing = set(db.session.execute(
+        db.select(Devis.id).where(Devis.id.in_(devis_ids))
+    ).scalars())
+    missing = [devis_id for devis_id in devis_ids if devis_id not in existing]
+    if missing:
+        return jsonify({'error': 'Devis introuvables', 'details': {'ids': missing}}), 404
+    
+    filename = f"devis_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(iter_zip(iter_bundle_files(devis_ids, BUNDLE_FORMATS[bundle_format]))),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
 if __name__ == '__main__':
-    with app.app_context():     
-        db.create_all()         
+    # Le rechargeur de debug relance ce script dans un processus enfant (WERKZEUG_RUN_MAIN) :
+    # seul celui-ci sert les requêtes, le processus de surveillance ne démarre rien
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(debug=True)
\ No newline at end of file
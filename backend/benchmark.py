@@ -0,0 +1,417 @@
+"""Benchmarks and load tests of the pricing and document pipeline.
+
+Run from the backend directory:
+
+    python benchmark.py micro [--iterations 200]
+    python benchmark.py load --devis 10000 [--scenario mixed] [--duration 30] [--concurrency 4]
+    python benchmark.py compare benchmark-results/old.json benchmark-results/new.json
+
+``micro`` times replace_placeholders_in_doc (python-docx reference), the compiled template
+render, serialize_devis and validate_devis_data for each of the six templates.
+
+``load`` seeds a SQLite database with --devis quotes (kept in --data-dir and reused by later
+runs), then drives the Flask application in-process with --concurrency threads running a
+weighted mix of requests for --duration seconds per scenario. PDFs go through the ``stub``
+converter, so it runs on Linux without Word or LibreOffice. Reads target a hot set of 1% of
+the quotes 80% of the time, as repeated opens of the same quotes do.
+
+Every run writes its results as JSON (--output, by default benchmark-results/) together
+with the commit and the machine, so that two releases can be compared with ``compare``.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Poids des requêtes de chaque scénario de charge
+SCENARIOS = {
+    'read': {'list': 50, 'detail': 35, 'search': 15},
+    'write': {'create': 50, 'patch': 50},
+    'download': {'docx': 60, 'pdf': 40},
+    'mixed': {'create': 5, 'patch': 5, 'list': 35, 'detail': 30, 'search': 10, 'docx': 10, 'pdf': 5},
+}
+
+GARANTIES = ['DO', 'TRC', 'DO+TRC']
+TYPES_TRAVAUX = ['Construction neuve', 'Rénovation', 'Extension', 'Réhabilitation']
+DESTINATIONS = ['Habitation', 'Bureaux', 'Commerce', 'Industrie', 'Entrepôt']
+CLIENTS = ['Dupont', 'Martin', 'Bernard', 'Durand', 'Lefebvre', 'Moreau', 'Laurent', 'Garnier']
+VILLES = ['Paris', 'Lyon', 'Marseille', 'Toulouse', 'Nantes', 'Lille', 'Bordeaux', 'Rennes']
+SEARCH_WORDS = CLIENTS + VILLES + ['logements', 'bureaux', 'extension']
+
+SEED_CHUNK_SIZE = 5000
+
+
+def sample_payload(rng, garantie=None, souhaite_rcmo=None):
+    """Random but valid request body of a devis, as sent by the form."""
+    garantie = garantie or rng.choice(GARANTIES)
+    souhaite_rcmo = rng.random() < 0.3 if souhaite_rcmo is None else souhaite_rcmo
+    client = rng.choice(CLIENTS)
+    ville = rng.choice(VILLES)
+    return {
+        'numero_opportunite': f"OPP-{rng.randrange(10 ** 6):06d}",
+        'nom_client': f"{client} {rng.choice(['SA', 'SAS', 'SCI', 'Promotion'])}",
+        'type_travaux': rng.choice(TYPES_TRAVAUX),
+        'cout_ouvrage': round(rng.uniform(1e5, 5e7), 2),
+        'presence_existant': rng.random() < 0.2,
+        'client_vip': rng.random() < 0.1,
+        'garantie': garantie,
+        'souhaite_rcmo': souhaite_rcmo,
+        'assurer_intervenants': rng.random() < 0.5,
+        'destination_ouvrage': rng.choice(DESTINATIONS),
+        'adresse_chantier': f"{rng.randrange(1, 200)} rue de la République, {ville}",
+        'description_ouvrage': f"Construction de {rng.randrange(2, 120)} logements et bureaux à {ville}",
+        'taux_do': round(rng.uniform(0.5, 3), 3) if 'DO' in garantie else None,
+        'taux_trc': round(rng.uniform(0.1, 1), 3) if 'TRC' in garantie else None,
+        'taux_rcmo': round(rng.uniform(0.05, 0.5), 3) if souhaite_rcmo else None,
+        'franchise_rcmo': 5000 if souhaite_rcmo else 0,
+        'montant_dm': 1500.0,
+        'montant_maintenance_visite': 800.0,
+        'montant_mesures_conservatoires': 1200.0,
+        'montant_rcmo': 150000.0 if souhaite_rcmo else None,
+        'montant_do': 1000000.0,
+        'montant_trc': 500000.0,
+        'franchise_trc': 3000.0,
+        'franchise_maintenance': 1500.0,
+    }
+
+
+def timing_stats(durations):
+    """Summary of durations in seconds: count, mean, percentiles and max in milliseconds."""
+    if not durations:
+        return {'count': 0}
+    ordered = sorted(durations)
+
+    def percentile(p):
+        # Rang le plus proche
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000
+
+    total = sum(ordered)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(total / len(ordered) * 1000, 4),
+        'min_ms': round(ordered[0] * 1000, 4),
+        'p50_ms': round(percentile(50), 4),
+        'p95_ms': round(percentile(95), 4),
+        'p99_ms': round(percentile(99), 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+    }
+
+
+def environment():
+    """Commit and machine description stored with the results."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def load_app(database_url, data_dir, pdf_delay):
+    """Import the application configured for benchmarking: stub PDF converter, no GC."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['DOCUMENT_DIR'] = os.path.join(data_dir, 'documents')
+    os.environ['PDF_CONVERTER'] = 'stub'
+    os.environ['PDF_STUB_DELAY'] = str(pdf_delay)
+    os.environ['DOCUMENT_GC_INTERVAL'] = '0'
+    os.environ.setdefault('LOG_SAMPLE_RATE', '0.01')
+    # Templates et journal sont relatifs au répertoire backend
+    os.chdir(BACKEND_DIR)
+    import app
+    return app
+
+
+def measure(func, iterations, setup=None):
+    """Durations of `iterations` calls of func(arg), arg = setup() prepared outside the timing."""
+    durations = []
+    for _ in range(iterations):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_micro(args):
+    from docx import Document
+
+    tarification = load_app(f"sqlite:///{os.path.join(args.data_dir, 'micro.db')}", args.data_dir, 0)
+    rng = random.Random(args.seed)
+    results = []
+    cases = sorted(tarification.TEMPLATE_FILENAMES.items(), key=lambda item: item[1])
+    for (garantie, souhaite_rcmo), template_filename in cases:
+        payload = sample_payload(rng, garantie, souhaite_rcmo)
+        devis = tarification.Devis(
+            id=1, date_creation=datetime.now(timezone.utc),
+            **tarification.build_devis_fields(dict(payload))
+        )
+        values = tarification.build_template_values(devis)
+        template_path = os.path.join(tarification.TEMPLATE_DIR, template_filename)
+        template = tarification.template_cache.get(template_path)
+
+        benchmarks = [
+            ('replace_placeholders_in_doc',
+             lambda doc: tarification.replace_placeholders_in_doc(doc, values),
+             lambda: Document(template_path)),
+            ('compiled_template_render', lambda _: template.render(values), None),
+            ('serialize_devis', lambda _: tarification.serialize_devis(devis), None),
+            ('validate_devis_data', lambda _: tarification.validate_devis_data(payload), None),
+        ]
+        for name, func, setup in benchmarks:
+            # Préchauffage (caches, imports paresseux) hors mesure
+            measure(func, min(10, args.iterations), setup)
+            stats = timing_stats(measure(func, args.iterations, setup))
+            results.append({'name': name, 'template': template_filename, **stats})
+            print(f"{name:30} {template_filename:28} p50 {stats['p50_ms']:9.3f} ms"
+                  f"  p95 {stats['p95_ms']:9.3f} ms")
+    return {'parameters': {'iterations': args.iterations, 'seed': args.seed}, 'results': results}
+
+
+def seed_database(path, count, seed):
+    """Create a SQLite database at `path` holding `count` random devis."""
+    import migrations
+    import rollups
+    from pricing import price_devis
+
+    engine = sa.create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    metadata = sa.MetaData()
+    devis = sa.Table('devis', metadata, autoload_with=engine)
+    rollup = sa.Table('devis_rollup', metadata, autoload_with=engine)
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for start in range(0, count, SEED_CHUNK_SIZE):
+            rows = []
+            for _ in range(min(SEED_CHUNK_SIZE, count - start)):
+                fields = sample_payload(rng)
+                fields.update(price_devis(fields))
+                fields['date_creation'] = now - timedelta(seconds=rng.randrange(2 * 365 * 86400))
+                rows.append(fields)
+            connection.execute(devis.insert(), rows)
+        rollups.rebuild(connection, rollup, devis)
+    engine.dispose()
+    print(f"Base de {count} devis créée en {time.perf_counter() - started:.1f} s : {path}")
+
+
+class LoadClient:
+    """One simulated user issuing the requests of a scenario through the Flask test client."""
+
+    def __init__(self, tarification, ids, rng):
+        self.client = tarification.app.test_client()
+        self.ids = ids
+        self.hot = ids[:max(1, len(ids) // 100)]
+        self.rng = rng
+
+    def pick_id(self):
+        # 80 % des requêtes sur 1 % des devis : réouvertures des mêmes devis
+        return self.rng.choice(self.hot if self.rng.random() < 0.8 else self.ids)
+
+    def create(self):
+        response = self.client.post('/api/devis', json=sample_payload(self.rng))
+        if response.status_code == 201:
+            self.ids.append(response.json['id'])
+        return response.status_code, 201
+
+    def patch(self):
+        body = {'nom_client': f"{self.rng.choice(CLIENTS)} SA",
+                'cout_ouvrage': round(self.rng.uniform(1e5, 5e7), 2)}
+        return self.client.patch(f'/api/devis/{self.pick_id()}', json=body).status_code, 200
+
+    def list(self):
+        query = self.rng.choice([
+            '', 'garantie=DO', 'client_vip=true', 'sort=prime_totale&order=desc',
+            'fields=id,numero_opportunite,nom_client,prime_totale',
+        ])
+        return self.client.get(f'/api/devis?limit=50&{query}').status_code, 200
+
+    def detail(self):
+        return self.client.get(f'/api/devis/{self.pick_id()}').status_code, 200
+
+    def search(self):
+        query = ' '.join(self.rng.sample(SEARCH_WORDS, self.rng.choice([1, 2])))
+        return self.client.get('/api/devis/search', query_string={'q': query}).status_code, 200
+
+    def docx(self):
+        return self.client.get(f'/api/devis/{self.pick_id()}/docx').status_code, 200
+
+    def pdf(self):
+        return self.client.get(f'/api/devis/{self.pick_id()}/pdf').status_code, 200
+
+
+def run_scenario(tarification, name, ids, args):
+    operations, weights = zip(*SCENARIOS[name].items())
+    timings = {operation: [] for operation in operations}
+    errors = {operation: 0 for operation in operations}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def user(index):
+        client = LoadClient(tarification, ids, random.Random(args.seed + index))
+        local = []
+        while time.perf_counter() < deadline:
+            operation = client.rng.choices(operations, weights)[0]
+            start = time.perf_counter()
+            try:
+                status, expected = getattr(client, operation)()
+                ok = status == expected
+            except Exception:
+                ok = False
+            local.append((operation, time.perf_counter() - start, ok))
+        with lock:
+            for operation, duration, ok in local:
+                timings[operation].append(duration)
+                errors[operation] += not ok
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(durations) for durations in timings.values())
+    result = {
+        'scenario': name,
+        'duration_s': round(elapsed, 3),
+        'requests': total,
+        'errors': sum(errors.values()),
+        'throughput_rps': round(total / elapsed, 2),
+        'operations': {
+            operation: {**timing_stats(timings[operation]), 'errors': errors[operation]}
+            for operation in operations
+        },
+    }
+    print(f"\n{name} : {total} requêtes, {result['throughput_rps']} req/s, {result['errors']} erreurs")
+    for operation, stats in result['operations'].items():
+        if stats['count']:
+            print(f"  {operation:8} {stats['count']:7} req  p50 {stats['p50_ms']:9.2f} ms"
+                  f"  p95 {stats['p95_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  erreurs {stats['errors']}")
+    return result
+
+
+def run_load(args):
+    seed_path = os.path.join(args.data_dir, f'seed-{args.devis}.db')
+    if not os.path.exists(seed_path):
+        seed_database(seed_path, args.devis, args.seed)
+    # Copie de travail : la base de référence reste identique d'un run à l'autre
+    run_path = os.path.join(args.data_dir, 'run.db')
+    for suffix in ['', '-wal', '-shm']:
+        if os.path.exists(run_path + suffix):
+            os.remove(run_path + suffix)
+    shutil.copyfile(seed_path, run_path)
+    shutil.rmtree(os.path.join(args.data_dir, 'documents'), ignore_errors=True)
+
+    tarification = load_app(f"sqlite:///{run_path}", args.data_dir, args.pdf_delay)
+    with tarification.app.app_context():
+        ids = tarification.db.session.execute(
+            sa.select(tarification.Devis.id).order_by(tarification.Devis.id)
+        ).scalars().all()
+    random.Random(args.seed).shuffle(ids)
+
+    scenarios = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    results = [run_scenario(tarification, name, ids, args) for name in scenarios]
+    return {
+        'parameters': {
+            'devis': args.devis, 'scenarios': scenarios, 'duration': args.duration,
+            'concurrency': args.concurrency, 'pdf_delay': args.pdf_delay, 'seed': args.seed,
+            'response_cache_ttl': tarification.response_cache.ttl,
+            'render_mode': tarification.RENDER_MODE,
+        },
+        'results': results,
+    }
+
+
+def result_rows(report):
+    """(key, stats) pairs of a results file, keyed to match the same measure across runs."""
+    if report['benchmark'] == 'micro':
+        return {(r['name'], r['template']): r for r in report['results']}
+    return {
+        (r['scenario'], operation): stats
+        for r in report['results'] for operation, stats in r['operations'].items()
+    }
+
+
+def run_compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)
+    if baseline['benchmark'] != candidate['benchmark']:
+        sys.exit("Les deux fichiers ne sont pas du même type de benchmark")
+    old_rows, new_rows = result_rows(baseline), result_rows(candidate)
+    print(f"{'mesure':60} {'p50 avant':>10} {'p50 après':>10} {'écart':>8}")
+    for key in sorted(old_rows.keys() & new_rows.keys()):
+        old, new = old_rows[key].get('p50_ms'), new_rows[key].get('p50_ms')
+        if not old or new is None:
+            continue
+        print(f"{' / '.join(key):60} {old:10.3f} {new:10.3f} {(new - old) / old * 100:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de l'application de tarification")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'tarification-benchmark'),
+                        help="bases de données et documents générés (réutilisés entre les runs)")
+    parser.add_argument('--output', help="fichier JSON des résultats (défaut : benchmark-results/<type>-<date>.json)")
+    parser.add_argument('--seed', type=int, default=42, help="graine des données aléatoires")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    micro = commands.add_parser('micro', help="micro-benchmarks par template")
+    micro.add_argument('--iterations', type=int, default=200)
+
+    load = commands.add_parser('load', help="scénarios de charge sur l'application")
+    load.add_argument('--devis', type=int, default=10000, help="nombre de devis de la base (10000, 100000...)")
+    load.add_argument('--scenario', choices=['all', *SCENARIOS], default='all')
+    load.add_argument('--duration', type=float, default=30, help="durée de chaque scénario en secondes")
+    load.add_argument('--concurrency', type=int, default=4, help="utilisateurs simultanés")
+    load.add_argument('--pdf-delay', type=float, default=0.2, help="durée simulée d'une conversion PDF")
+
+    compare = commands.add_parser('compare', help="comparer deux fichiers de résultats")
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        run_compare(args)
+        return
+
+    output = os.path.abspath(args.output or os.path.join(
+        'benchmark-results', f"{args.command}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    ))
+    args.data_dir = os.path.abspath(args.data_dir)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    report = run_micro(args) if args.command == 'micro' else run_load(args)
+    report = {'benchmark': args.command, 'started_at': started_at, 'environment': environment(), **report}
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Streaming parsers for bulk quote imports (CSV and JSON Lines).
+
+Parsers read the request body incrementally and yield one ``(row_number, data, error)``
+tuple per record, so an import of any size is never loaded in memory at once.
+"""
+import codecs
+import csv
+import io
+import json
+
+CSV_MIMETYPES = ['text/csv', 'application/csv']
+JSONL_MIMETYPES = ['application/x-ndjson', 'application/jsonl', 'application/x-jsonlines']
+
+TRUE_VALUES = ['1', 'true', 'vrai', 'oui', 'yes', 'o', 'y']
+FALSE_VALUES = ['0', 'false', 'faux', 'non', 'no', 'n', '']
+
+
+def detect_format(mimetype, requested_format=None):
+    """Return 'csv' or 'jsonl' from the ?format= parameter or the request mimetype."""
+    if requested_format in ['csv', 'jsonl']:
+        return requested_format
+    if mimetype in CSV_MIMETYPES:
+        return 'csv'
+    if mimetype in JSONL_MIMETYPES:
+        return 'jsonl'
+    return None
+
+
+def iter_csv_rows(stream):
+    """Yield the records of a CSV stream. The delimiter (',' or ';') is read from the header."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    header = text.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fieldnames = [name.strip() for name in next(csv.reader([header], delimiter=delimiter), [])]
+    reader = csv.DictReader(text, fieldnames=fieldnames, delimiter=delimiter)
+    for row_number, row in enumerate(reader, start=1):
+        if None in row:
+            yield row_number, None, {'ligne': "Nombre de colonnes supérieur à l'en-tête"}
+            continue
+        yield row_number, {key: (value or '').strip() for key, value in row.items()}, None
+
+
+def iter_jsonl_rows(stream):
+    """Yield the records of a JSON Lines stream, skipping blank lines."""
+    reader = codecs.getreader('utf-8-sig')(stream)
+    row_number = 0
+    for line in reader:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, {'ligne': f"JSON invalide : {e}"}
+            continue
+        if not isinstance(data, dict):
+            yield row_number, None, {'ligne': "Chaque ligne doit être un objet JSON"}
+            continue
+        yield row_number, data, None
+
+
+def coerce_csv_row(data, boolean_fields, float_fields):
+    """Convert the text cells of a CSV record to booleans and floats.
+
+    Returns (data, errors). Decimal commas are accepted ("1234,50").
+    """
+    errors = {}
+    for field in boolean_fields:
+        if field in data:
+            value = data[field].lower()
+            if value in TRUE_VALUES:
+                data[field] = True
+            elif value in FALSE_VALUES:
+                data[field] = False
+            else:
+                errors[field] = f"Le champ '{field}' doit être un booléen (oui/non, true/false, 1/0)"
+    for field in float_fields:
+        if field in data and data[field] != '':
+            try:
+                data[field] = _parse_float(data[field])
+            except ValueError:
+                errors[field] = f"Le champ '{field}' doit être un nombre valide"
+    return data, errors
+
+
+def coerce_json_row(data, boolean_fields, float_fields, text_fields):
+    """Check the value types of a JSON Lines record, as stored by the insert.
+
+    Returns (data, errors). Booleans must be true / false; numbers may also be numeric
+    strings, converted as in CSV; text fields accept numbers, stored as text. null and ''
+    are left to the validation of required fields.
+    """
+    errors = {}
+    for field in boolean_fields:
+        if data.get(field) is not None and not isinstance(data[field], bool):
+            errors[field] = f"Le champ '{field}' doit être un booléen (true/false)"
+    for field in float_fields:
+        value = data.get(field)
+        if value is None or value == '':
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            errors[field] = f"Le champ '{field}' doit être un nombre valide"
+            continue
+        try:
+            data[field] = _parse_float(value) if isinstance(value, str) else float(value)
+        except (ValueError, OverflowError):
+            errors[field] = f"Le champ '{field}' doit être un nombre valide"
+    for field in text_fields:
+        value = data.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            data[field] = str(value)
+        elif value is not None and not isinstance(value, str):
+            errors[field] = f"Le champ '{field}' doit être un texte"
+    return data, errors
+
+
+def _parse_float(text):
+    """Float of a number written with spaces and / or a decimal comma ("1 234,50")."""
+    return float(text.replace(' ', '').replace(',', '.'))
@@ -0,0 +1,88 @@
+"""Change feed of the devis table, for clients synchronizing a local copy.
+
+Database triggers (migration 7) keep one row per devis in devis_change with the version of
+its last write, taken from a single counter: versions only increase and become visible in
+increasing order. A client stores the last version it has seen and asks for the rows with
+a greater one, so a sync costs O(changes) instead of O(table). A deleted devis keeps its
+row with deleted = true (tombstone).
+
+ChangeNotifier wakes up the server-sent event streams of this process after a write, and
+carries the document events (a PDF finished in the background), which are not versioned.
+"""
+import json
+import threading
+from collections import deque
+
+import sqlalchemy as sa
+
+
+def head_version(connection, counter_table):
+    """Version of the last write to the devis table (0 for an empty table)."""
+    return connection.execute(sa.select(counter_table.c.value)).scalar() or 0
+
+
+def read_changes(connection, change_table, devis_table, columns, since, limit):
+    """Changes with a version greater than `since`, oldest first.
+
+    Returns (rows, has_more). Each row holds version, devis_id and deleted, then `columns`
+    of the devis (NULL for a deleted devis).
+    """
+    statement = (
+        sa.select(change_table.c.version, change_table.c.devis_id, change_table.c.deleted, *columns)
+        .select_from(change_table.outerjoin(devis_table, devis_table.c.id == change_table.c.devis_id))
+        .where(change_table.c.version > since)
+        .order_by(change_table.c.version)
+        .limit(limit + 1)
+    )
+    rows = connection.execute(statement).all()
+    return rows[:limit], len(rows) > limit
+
+
+def format_event(event, data, event_id=None):
+    """A server-sent event, `data` encoded in JSON."""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        # Renvoyé par EventSource dans Last-Event-ID à la reconnexion
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False, separators=(",", ":"))}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class ChangeNotifier:
+    """Wake-up signal of the event streams, with the recent document events."""
+
+    def __init__(self, history=1000):
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._documents = deque(maxlen=history)
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def notify(self):
+        """Signal a committed write to the devis table."""
+        with self._condition:
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def document_ready(self, event):
+        """Publish a document event (dict) to the streams."""
+        with self._condition:
+            self._sequence += 1
+            self._documents.append((self._sequence, event))
+            self._condition.notify_all()
+
+    def documents_since(self, sequence):
+        """(sequence, event) pairs of the document events published after `sequence`."""
+        with self._condition:
+            return [(number, event) for number, event in self._documents if number > sequence]
+
+    def wait(self, sequence, timeout):
+        """Block until something is published after `sequence` or `timeout` expires.
+
+        Returns the current sequence.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != sequence, timeout)
+            return self._sequence
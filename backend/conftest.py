@@ -0,0 +1,49 @@
+"""Test fixtures: the application on a temporary SQLite database.
+
+The environment is set before app is imported, since app reads its configuration at
+import time; the database, the documents and the log file are in a temporary directory. Background rendering and the document GC are disabled and PDFs come from
+the stub converter, so the tests need neither Word nor LibreOffice.
+"""
+import os
+import tempfile
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix='tarification-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_data_dir, 'devis.db')}",
+    'DOCUMENT_DIR': os.path.join(_data_dir, 'documents'),
+    'PDF_CONVERTER': 'stub',
+    'RENDER_WORKERS': '0',
+    'DOCUMENT_GC_INTERVAL': '0',
+    'LOG_FILE': os.path.join(_data_dir, 'tarification.log'),
+})
+
+import app as tarification  # noqa: E402
+
+DEVIS_DATA = {
+    'numero_opportunite': 'OPP-TEST',
+    'nom_client': 'Client test',
+    'type_travaux': 'Construction neuve',
+    'cout_ouvrage': 100000,
+    'garantie': 'DO+TRC',
+    'adresse_chantier': '1 rue du Test, Paris',
+    'description_ouvrage': 'Maison individuelle',
+    'taux_do': 1.5,
+    'taux_trc': 0.5,
+}
+
+
+@pytest.fixture
+def client():
+    return tarification.app.test_client()
+
+
+@pytest.fixture
+def create_devis(client):
+    """Create a devis through the API and return its id; keyword arguments override DEVIS_DATA."""
+    def create(**fields):
+        response = client.post('/api/devis', json={**DEVIS_DATA, **fields})
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return create
@@ -0,0 +1,85 @@
+"""Database connection settings.
+
+The URI comes from DATABASE_URL (PostgreSQL in production, SQLite by default for a
+single-node setup). Server databases get a tuned connection pool; SQLite connections are
+switched to WAL mode so readers never block the writer, and wait on a busy timeout instead
+of failing with "database is locked" when two writers collide.
+"""
+import os
+
+from sqlalchemy import event, text
+
+DEFAULT_DATABASE_URI = 'sqlite:///devis.db'
+
+
+def database_uri(environ=os.environ):
+    """Return the database URI configured in DATABASE_URL."""
+    uri = environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Les hébergeurs fournissent souvent 'postgres://', refusé par SQLAlchemy
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def engine_options(uri, environ=os.environ):
+    """Return the SQLALCHEMY_ENGINE_OPTIONS for `uri`, overridable by environment variables."""
+    if is_sqlite(uri):
+        busy_timeout = int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+        options = {
+            # Délai du module sqlite3 (secondes), aligné sur le busy_timeout
+            'connect_args': {'timeout': busy_timeout / 1000},
+        }
+        if ':memory:' in uri or uri in ['sqlite://', 'sqlite:///']:
+            return options
+        options.update({
+            'pool_size': int(environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 10)),
+        })
+        return options
+
+    return {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', 30)),
+        # Renouveler les connexions avant qu'un proxy ou le serveur ne les coupe
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_sqlite(engine, environ=os.environ):
+    """Apply the WAL / synchronous / busy_timeout pragmas to every new SQLite connection."""
+    if engine.dialect.name != 'sqlite':
+        return
+    journal_mode = environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    synchronous = environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    busy_timeout = int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # WAL : les lectures ne bloquent plus l'écriture (ignoré pour une base en mémoire)
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            # En WAL, NORMAL reste sûr en cas de crash applicatif et évite un fsync par commit
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+            cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+            cursor.execute('PRAGMA foreign_keys=ON')
+        finally:
+            cursor.close()
+
+
+def begin_write(session):
+    """Start the transaction of `session` holding the SQLite write lock (BEGIN IMMEDIATE).
+
+    A SQLite transaction only takes the lock at its first write, so a row read before it
+    may be changed by another writer in between. Call this before reading rows that the
+    transaction then updates from their old values; on PostgreSQL, lock these rows with
+    SELECT ... FOR UPDATE instead (no-op here).
+    """
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(text('BEGIN IMMEDIATE'))
@@ -0,0 +1,130 @@
+"""Sharded document storage and garbage collection of unreferenced files.
+
+Documents are stored under ``<root>/<ab>/<cd>/<hash>.<ext>`` (first two byte pairs of the
+content hash), so no directory grows beyond a few hundred files. Which devis uses which
+file is recorded in the document_artifact table; a row whose devis_id is NULL is an
+orphan, i.e. a file a devis used before being modified. ArtifactCollector deletes those
+files in a background thread once no live row references them anymore, and periodically
+sweeps the storage for files unknown to the table (interrupted renders, former layout).
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+
+def shard_path(root, key, ext):
+    """Path of the document of content hash `key` with extension `ext`."""
+    return os.path.join(root, key[:2], key[2:4], f"{key}.{ext}")
+
+
+class ArtifactCollector:
+    """Background thread deleting the documents no devis references anymore.
+
+    `grace` (seconds) protects recent files: a render is recorded in the table only after
+    the file is written, and an orphan may be reused by a devis getting the same content back.
+    """
+
+    def __init__(self, engine, table, root, interval=300, sweep_interval=86400, grace=3600,
+                 batch_size=500):
+        self._engine = engine
+        self._table = table
+        self._root = root
+        self._interval = interval
+        self._sweep_interval = sweep_interval
+        self._grace = grace
+        self._batch_size = batch_size
+        self._last_sweep = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='document-gc', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.collect_orphans()
+                if time.monotonic() - self._last_sweep >= self._sweep_interval:
+                    self._last_sweep = time.monotonic()
+                    self.sweep()
+            except Exception as e:
+                logger.error(f"Erreur du ramasse-miettes des documents : {str(e)}")
+
+    def collect_orphans(self):
+        """Delete the orphan rows older than the grace period, and their files if unused."""
+        table = self._table
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self._grace)
+        removed = 0
+        while True:
+            with self._engine.begin() as connection:
+                orphans = connection.execute(
+                    sa.select(table.c.id, table.c.path)
+                    .where(table.c.devis_id.is_(None), table.c.created_at < cutoff)
+                    .limit(self._batch_size)
+                ).all()
+                if not orphans:
+                    break
+                paths = {path for _, path in orphans}
+                in_use = set(connection.execute(
+                    sa.select(table.c.path).distinct()
+                    .where(table.c.path.in_(paths), table.c.devis_id.is_not(None))
+                ).scalars())
+                connection.execute(table.delete().where(table.c.id.in_([id_ for id_, _ in orphans])))
+            for path in paths - in_use:
+                removed += self._remove(path)
+        if removed:
+            logger.info(f"Ramasse-miettes : {removed} document(s) orphelin(s) supprimé(s)")
+        return removed
+
+    def sweep(self):
+        """Delete the files of the storage that no row references (older than the grace period)."""
+        if not os.path.isdir(self._root):
+            return 0
+        cutoff = time.time() - self._grace
+        removed = 0
+        for directory, _, filenames in os.walk(self._root):
+            candidates = []
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                if filename.endswith('.tmp'):
+                    removed += self._remove(path)
+                else:
+                    candidates.append(path)
+            for start in range(0, len(candidates), self._batch_size):
+                batch = candidates[start:start + self._batch_size]
+                with self._engine.connect() as connection:
+                    known = set(connection.execute(
+                        sa.select(self._table.c.path).where(self._table.c.path.in_(batch))
+                    ).scalars())
+                for path in batch:
+                    if path not in known:
+                        removed += self._remove(path)
+        if removed:
+            logger.info(f"Ramasse-miettes : {removed} fichier(s) non référencé(s) supprimé(s)")
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error(f"Erreur lors de la suppression de l'ancien fichier {path}: {str(e)}")
+            return 0
@@ -0,0 +1,184 @@
+"""Compiled Word templates.
+
+A template is parsed once with python-docx: every paragraph (body and table cells) is
+merged into its first run exactly like replace_placeholders_in_doc does, and every
+placeholder is located with a single combined regex. The resulting document XML is
+kept as a list of static byte chunks around the placeholder slots and the other
+parts of the package are compressed once, so rendering a quote only splices the
+escaped values between the chunks and appends word/document.xml to the zip.
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.oxml.ns import qn
+
+DOCUMENT_PART = 'word/document.xml'
+
+# Caractères de la zone d'usage privé Unicode : absents des templates, valides en XML
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+# Équivalents XML des caractères que python-docx transforme en éléments dans un run
+_RUN_BREAKS = {
+    '\t': '</w:t><w:tab/><w:t xml:space="preserve">',
+    '\n': '</w:t><w:br/><w:t xml:space="preserve">',
+    '\r': '</w:t><w:br/><w:t xml:space="preserve">',
+}
+_RUN_BREAKS_RE = re.compile('[\t\n\r]')
+# Caractères hors de la plage Char de XML 1.0 (caractères de contrôle, U+FFFE, U+FFFF) :
+# ils rendraient document.xml invalide, et python-docx les refuse
+_INVALID_XML_RE = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+
+def _iter_paragraphs(doc):
+    """Yield the paragraphs handled by replace_placeholders_in_doc, in the same order.
+
+    Merged cells are returned several times by row.cells: each paragraph is yielded once.
+    """
+    yield from doc.paragraphs
+    seen = set()
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    # Garder l'élément lxml dans le set maintient son proxy (et son hash) stable
+                    if paragraph._p not in seen:
+                        seen.add(paragraph._p)
+                        yield paragraph
+
+
+def _xml_value(value):
+    """Return the UTF-8 XML fragment for a value spliced inside a <w:t> element.
+
+    Characters that XML 1.0 does not allow are dropped.
+    """
+    text = escape(_INVALID_XML_RE.sub('', str(value)))
+    if '\t' in text or '\n' in text or '\r' in text:
+        text = _RUN_BREAKS_RE.sub(lambda m: _RUN_BREAKS[m.group(0)], text)
+    return text.encode('utf-8')
+
+
+class CompiledTemplate:
+    """A Word template pre-split around its placeholders, ready to be rendered."""
+
+    def __init__(self, path, digest, chunks, keys, document_info, base_zip):
+        self.path = path
+        self.digest = digest
+        self._chunks = chunks
+        self._keys = keys
+        self._document_info = document_info
+        self._base_zip = base_zip
+
+    @property
+    def placeholders(self):
+        """Placeholders found in the document, in document order."""
+        return list(self._keys)
+
+    def _document_xml(self, values):
+        parts = [self._chunks[0]]
+        for key, chunk in zip(self._keys, self._chunks[1:]):
+            parts.append(_xml_value(values[key]))
+            parts.append(chunk)
+        return b''.join(parts)
+
+    def render(self, values):
+        """Render the template with `values` and return the .docx content as bytes."""
+        # Les autres parties sont déjà compressées dans base_zip : seul document.xml est écrit
+        buffer = io.BytesIO()
+        buffer.write(self._base_zip)
+        filename, date_time, compress_type = self._document_info
+        info = zipfile.ZipInfo(filename, date_time)
+        info.compress_type = compress_type
+        with zipfile.ZipFile(buffer, 'a') as zf:
+            zf.writestr(info, self._document_xml(values))
+        return buffer.getvalue()
+
+    def save(self, values, filepath):
+        """Render the template with `values` into `filepath`."""
+        content = self.render(values)
+        with open(filepath, 'wb') as f:
+            f.write(content)
+
+
+def compile_template(template_path, placeholders):
+    """Parse a Word template once and locate `placeholders` in its document XML."""
+    pattern = re.compile('|'.join(
+        re.escape(key) for key in sorted(placeholders, key=len, reverse=True)
+    ))
+
+    with open(template_path, 'rb') as f:
+        template_bytes = f.read()
+    digest = hashlib.sha256(template_bytes).hexdigest()
+
+    doc = Document(io.BytesIO(template_bytes))
+    for paragraph in _iter_paragraphs(doc):
+        runs = paragraph.runs
+        if not runs:
+            continue
+        inline_text = ''.join(run.text for run in runs)
+        runs[0].text = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, inline_text)
+        for i in range(1, len(runs)):
+            runs[i].text = ''
+        # Une valeur peut commencer ou finir par un espace : le conserver dans Word
+        for t in runs[0]._r.iter(qn('w:t')):
+            if t.text and MARK_START in t.text:
+                t.set(qn('xml:space'), 'preserve')
+
+    document_xml = doc.part.blob.decode('utf-8')
+    pieces = re.split(f'{MARK_START}(.*?){MARK_END}', document_xml)
+    chunks = [piece.encode('utf-8') for piece in pieces[0::2]]
+    keys = pieces[1::2]
+
+    # Toutes les parties sauf document.xml sont compressées une fois pour toutes
+    base_zip = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as src, zipfile.ZipFile(base_zip, 'w') as dst:
+        for info in src.infolist():
+            if info.filename == DOCUMENT_PART:
+                document_info = (info.filename, info.date_time, info.compress_type)
+            else:
+                dst.writestr(info, src.read(info.filename))
+
+    return CompiledTemplate(template_path, digest, chunks, keys, document_info, base_zip.getvalue())
+
+
+class TemplateCache:
+    """Compiled templates kept in memory and recompiled when their file changes.
+
+    Compiled templates are immutable, so every render shares the cached instance
+    instead of cloning a parsed document.
+    """
+
+    def __init__(self, placeholders):
+        self._placeholders = list(placeholders)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path):
+        """Return the compiled template for `template_path`, reloading it if its mtime changed."""
+        stat = os.stat(template_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(template_path)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(template_path)
+            if entry is None or entry[0] != version:
+                entry = (version, compile_template(template_path, self._placeholders))
+                self._entries[template_path] = entry
+            return entry[1]
+
+    def version(self, template_path):
+        """Return the (mtime_ns, size) of the cached template, or None if not loaded."""
+        entry = self._entries.get(template_path)
+        return entry[0] if entry is not None else None
+
+    def preload(self, template_paths):
+        """Compile all `template_paths` ahead of the first render."""
+        for template_path in template_paths:
+            self.get(template_path)
@@ -0,0 +1,65 @@
+"""Non-blocking, sampled application logging.
+
+Request threads only put records on an in-memory queue (QueueHandler); a QueueListener
+thread formats them and writes them to the console and the log file, so a slow disk never
+delays a response. Records logged with ``extra=SAMPLED`` come from hot paths (one line per
+request or per document): only a `sample_rate` fraction of them below WARNING is kept.
+"""
+import logging
+import logging.handlers
+import queue
+import random
+
+# À passer en extra= aux messages du chemin critique pour les échantillonner
+SAMPLED = {'sampled': True}
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a `rate` fraction of the records marked as sampled, below WARNING."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler dropping records when its bounded queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging(filename, level=logging.INFO, sample_rate=1.0, max_queue=10000):
+    """Route the root logger through a queue to the console and `filename`.
+
+    Returns the started QueueListener; call its stop() at exit to flush the queue.
+    When the queue is full (disk stalled), new records are dropped instead of blocking.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(), logging.FileHandler(filename)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.Queue(maxsize=max_queue)
+    queue_handler = DroppingQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,319 @@
+"""Versioned schema migrations.
+
+Migrations are plain functions registered with @migration(version, description) and
+applied in version order, each in its own transaction. The versions already applied are
+recorded in the ``schema_version`` table, so upgrading an existing database only runs the
+new ones. A migration receives a Connection and must not import the application models:
+it describes the schema as it was at that version.
+
+Databases created by the former ``db.create_all()`` have no ``schema_version`` table:
+migrations check for existing objects (checkfirst) so they can be adopted safely.
+"""
+import logging
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+schema_version = sa.Table(
+    'schema_version', sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('description', sa.String(200)),
+    sa.Column('applied_at', sa.DateTime),
+)
+
+# Clé du verrou consultatif PostgreSQL pris pendant la migration (plusieurs workers)
+PG_MIGRATION_LOCK = 73310511
+
+
+def migration(version, description):
+    """Register a migration function for `version`."""
+    def register(func):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Migration {version} déjà définie")
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def current_version(connection):
+    """Highest applied version, 0 for a database never migrated."""
+    if not sa.inspect(connection).has_table('schema_version'):
+        return 0
+    return connection.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine, target=None):
+    """Apply the pending migrations up to `target` (all by default). Returns the new version."""
+    with engine.connect() as connection:
+        postgresql = engine.dialect.name == 'postgresql'
+        if postgresql:
+            connection.execute(sa.text('SELECT pg_advisory_lock(:key)'), {'key': PG_MIGRATION_LOCK})
+            connection.commit()
+        try:
+            with connection.begin():
+                schema_version.create(connection, checkfirst=True)
+            version = current_version(connection)
+            connection.commit()
+
+            for number, description, func in MIGRATIONS:
+                if number <= version or (target is not None and number > target):
+                    continue
+                logger.info(f"Migration {number} : {description}")
+                with connection.begin():
+                    func(connection)
+                    connection.execute(schema_version.insert().values(
+                        version=number, description=description,
+                        applied_at=datetime.now(timezone.utc)
+                    ))
+                version = number
+            return version
+        finally:
+            if postgresql:
+                connection.execute(sa.text('SELECT pg_advisory_unlock(:key)'), {'key': PG_MIGRATION_LOCK})
+                connection.commit()
+
+
+def _devis_table(metadata):
+    """The devis table as created by the first version of the application."""
+    return sa.Table(
+        'devis', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('numero_opportunite', sa.String(100)),
+        sa.Column('nom_client', sa.String(100)),
+        sa.Column('date_creation', sa.DateTime),
+        sa.Column('type_travaux', sa.String(50)),
+        sa.Column('cout_ouvrage', sa.Float),
+        sa.Column('presence_existant', sa.Boolean),
+        sa.Column('client_vip', sa.Boolean),
+        sa.Column('garantie', sa.String(50)),
+        sa.Column('souhaite_rcmo', sa.Boolean),
+        sa.Column('assurer_intervenants', sa.Boolean),
+        sa.Column('destination_ouvrage', sa.String(100)),
+        sa.Column('adresse_chantier', sa.String(200)),
+        sa.Column('description_ouvrage', sa.Text),
+        sa.Column('taux_do', sa.Float),
+        sa.Column('taux_trc', sa.Float),
+        sa.Column('taux_rcmo', sa.Float),
+        sa.Column('franchise_rcmo', sa.Float),
+        sa.Column('prime_do', sa.Float),
+        sa.Column('prime_trc', sa.Float),
+        sa.Column('prime_rcmo', sa.Float),
+        sa.Column('prime_totale', sa.Float),
+        sa.Column('montant_dm', sa.Float),
+        sa.Column('montant_maintenance_visite', sa.Float),
+        sa.Column('montant_mesures_conservatoires', sa.Float),
+        sa.Column('montant_rcmo', sa.Float),
+        sa.Column('montant_do', sa.Float),
+        sa.Column('montant_trc', sa.Float),
+        sa.Column('franchise_trc', sa.Float),
+        sa.Column('franchise_maintenance', sa.Float),
+    )
+
+
+@migration(1, "Table devis")
+def create_devis(connection):
+    _devis_table(sa.MetaData()).create(connection, checkfirst=True)
+
+
+@migration(2, "Index des filtres et de la pagination par curseur")
+def add_devis_indexes(connection):
+    devis = _devis_table(sa.MetaData())
+    indexes = [
+        # Filtres de la liste et recherche des documents d'une opportunité
+        sa.Index('ix_devis_numero_opportunite', devis.c.numero_opportunite),
+        sa.Index('ix_devis_client_vip', devis.c.client_vip),
+        sa.Index('ix_devis_garantie', devis.c.garantie),
+        # (clé de tri, id) pour la pagination par curseur
+        sa.Index('ix_devis_date_creation_id', devis.c.date_creation, devis.c.id),
+        sa.Index('ix_devis_prime_totale_id', devis.c.prime_totale, devis.c.id),
+        sa.Index('ix_devis_numero_opportunite_id', devis.c.numero_opportunite, devis.c.id),
+    ]
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+
+@migration(3, "Table document_artifact")
+def create_document_artifact(connection):
+    metadata = sa.MetaData()
+    _devis_table(metadata)
+    artifacts = sa.Table(
+        'document_artifact', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('devis_id', sa.Integer, sa.ForeignKey('devis.id', ondelete='SET NULL')),
+        sa.Column('kind', sa.String(10), nullable=False),
+        sa.Column('path', sa.String(255), nullable=False),
+        sa.Column('hash', sa.String(64), nullable=False),
+        sa.Column('size', sa.Integer),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        # Un document courant par devis et par type
+        sa.UniqueConstraint('devis_id', 'kind', name='uq_document_artifact_devis_kind'),
+        sa.Index('ix_document_artifact_path', 'path'),
+        sa.Index('ix_document_artifact_hash_kind', 'hash', 'kind'),
+        # Orphelins (devis_id NULL) par ancienneté pour le ramasse-miettes
+        sa.Index('ix_document_artifact_devis_created', 'devis_id', 'created_at'),
+    )
+    artifacts.create(connection, checkfirst=True)
+
+
+@migration(4, "Table render_job")
+def create_render_job(connection):
+    metadata = sa.MetaData()
+    _devis_table(metadata)
+    jobs = sa.Table(
+        'render_job', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('devis_id', sa.Integer, sa.ForeignKey('devis.id', ondelete='CASCADE'),
+                  nullable=False, unique=True),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('attempts', sa.Integer, nullable=False, default=0),
+        sa.Column('error', sa.Text),
+        sa.Column('requested_at', sa.DateTime, nullable=False),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+        # Jobs en attente par ancienneté pour les workers
+        sa.Index('ix_render_job_status_requested', 'status', 'requested_at'),
+    )
+    jobs.create(connection, checkfirst=True)
+
+
+def _devis_rollup_table(metadata):
+    return sa.Table(
+        'devis_rollup', metadata,
+        sa.Column('garantie', sa.String(50), primary_key=True),
+        sa.Column('type_travaux', sa.String(50), primary_key=True),
+        sa.Column('destination_ouvrage', sa.String(100), primary_key=True),
+        sa.Column('month', sa.String(7), primary_key=True),
+        sa.Column('client_vip', sa.Boolean, primary_key=True),
+        sa.Column('devis_count', sa.Integer, nullable=False),
+        sa.Column('prime_do', sa.Float, nullable=False),
+        sa.Column('prime_trc', sa.Float, nullable=False),
+        sa.Column('prime_rcmo', sa.Float, nullable=False),
+        sa.Column('prime_totale', sa.Float, nullable=False),
+    )
+
+
+@migration(5, "Table devis_rollup (totaux des primes)")
+def create_devis_rollup(connection):
+    import rollups
+
+    metadata = sa.MetaData()
+    devis = _devis_table(metadata)
+    rollup = _devis_rollup_table(metadata)
+    rollup.create(connection, checkfirst=True)
+    # Totaux initiaux calculés à partir des devis existants
+    rollups.rebuild(connection, rollup, devis)
+
+
+# Colonnes indexées en texte intégral, de la plus à la moins discriminante
+SEARCH_COLUMNS = ['numero_opportunite', 'nom_client', 'adresse_chantier', 'description_ouvrage']
+
+
+@migration(6, "Index de recherche plein texte")
+def create_search_index(connection):
+    if connection.dialect.name == 'postgresql':
+        # Colonne générée : tenue à jour par PostgreSQL à chaque écriture
+        weights = dict(zip(SEARCH_COLUMNS, 'AABC'))
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+            for column, weight in weights.items()
+        )
+        connection.execute(sa.text(
+            f"ALTER TABLE devis ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        ))
+        connection.execute(sa.text(
+            "CREATE INDEX IF NOT EXISTS ix_devis_search_vector ON devis USING gin (search_vector)"
+        ))
+        return
+
+    # SQLite : table FTS5 à contenu externe (les textes restent dans devis), synchronisée par triggers
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS devis_fts USING fts5({columns}, "
+        f"content='devis', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS devis_fts_insert AFTER INSERT ON devis BEGIN "
+        f"INSERT INTO devis_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS devis_fts_delete AFTER DELETE ON devis BEGIN "
+        f"INSERT INTO devis_fts(devis_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS devis_fts_update AFTER UPDATE OF {columns} ON devis BEGIN "
+        f"INSERT INTO devis_fts(devis_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO devis_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        # Indexer les devis existants
+        "INSERT INTO devis_fts(devis_fts) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        connection.execute(sa.text(statement))
+
+
+@migration(7, "Journal des modifications des devis (synchronisation incrémentale)")
+def create_change_feed(connection):
+    metadata = sa.MetaData()
+    devis = _devis_table(metadata)
+    # Dernière modification de chaque devis ; pas de clé étrangère : la ligne d'un devis
+    # supprimé reste comme marqueur de suppression (tombstone)
+    changes = sa.Table(
+        'devis_change', metadata,
+        sa.Column('devis_id', sa.Integer, primary_key=True),
+        sa.Column('version', sa.BigInteger, nullable=False),
+        sa.Column('deleted', sa.Boolean, nullable=False),
+        sa.Column('changed_at', sa.DateTime, nullable=False),
+        sa.Index('ix_devis_change_version', 'version', unique=True),
+    )
+    counter = sa.Table(
+        'devis_change_counter', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('value', sa.BigInteger, nullable=False),
+    )
+    changes.create(connection, checkfirst=True)
+    counter.create(connection, checkfirst=True)
+
+    # Devis existants : version = id, dans l'ordre de création
+    connection.execute(changes.insert().from_select(
+        ['devis_id', 'version', 'deleted', 'changed_at'],
+        sa.select(devis.c.id, devis.c.id, sa.false(),
+                  sa.func.coalesce(devis.c.date_creation, sa.func.current_timestamp()))
+    ))
+    connection.execute(counter.insert().values(
+        id=1, value=sa.select(sa.func.coalesce(sa.func.max(devis.c.id), 0)).scalar_subquery()
+    ))
+
+    # Versions attribuées par la base à chaque écriture, quel que soit le code qui écrit.
+    # La ligne du compteur reste verrouillée jusqu'au commit : les versions deviennent
+    # visibles dans l'ordre croissant, un client ne peut pas en manquer une
+    if connection.dialect.name == 'postgresql':
+        connection.execute(sa.text(
+            "CREATE OR REPLACE FUNCTION devis_record_change() RETURNS trigger AS $$\n"
+            "DECLARE next_version bigint;\n"
+            "BEGIN\n"
+            "  UPDATE devis_change_counter SET value = value + 1 WHERE id = 1 RETURNING value INTO next_version;\n"
+            "  INSERT INTO devis_change (devis_id, version, deleted, changed_at)\n"
+            "  VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, next_version,\n"
+            "          TG_OP = 'DELETE', now())\n"
+            "  ON CONFLICT (devis_id) DO UPDATE SET version = EXCLUDED.version,\n"
+            "    deleted = EXCLUDED.deleted, changed_at = EXCLUDED.changed_at;\n"
+            "  RETURN NULL;\n"
+            "END $$ LANGUAGE plpgsql"
+        ))
+        connection.execute(sa.text("DROP TRIGGER IF EXISTS devis_change ON devis"))
+        connection.execute(sa.text(
+            "CREATE TRIGGER devis_change AFTER INSERT OR UPDATE OR DELETE ON devis "
+            "FOR EACH ROW EXECUTE FUNCTION devis_record_change()"
+        ))
+        return
+
+    for event, row, deleted in [('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)]:
+        connection.execute(sa.text(
+            f"CREATE TRIGGER IF NOT EXISTS devis_change_{event.lower()} AFTER {event} ON devis BEGIN "
+            f"UPDATE devis_change_counter SET value = value + 1 WHERE id = 1; "
+            f"INSERT INTO devis_change (devis_id, version, deleted, changed_at) "
+            f"VALUES ({row}.id, (SELECT value FROM devis_change_counter WHERE id = 1), {deleted}, CURRENT_TIMESTAMP) "
+            f"ON CONFLICT (devis_id) DO UPDATE SET version = excluded.version, "
+            f"deleted = excluded.deleted, changed_at = excluded.changed_at; END"
+        ))
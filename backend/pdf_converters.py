@@ -0,0 +1,296 @@
+"""PDF conversion backends.
+
+Two backends convert a generated DOCX into PDF:
+
+- ``docx2pdf``: Microsoft Word through COM automation (Windows only).
+- ``libreoffice``: a pool of long-lived headless LibreOffice processes, each driven by an
+  ``unoserver`` listener. Workers are started once and reused across requests, recycled
+  after a number of jobs, and killed when a job exceeds its timeout.
+
+A ``stub`` backend writes a fixed one-page PDF after an optional delay, for benchmarks and
+development machines without Word or LibreOffice.
+"""
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PdfConversionError(Exception):
+    """Raised when a document could not be converted to PDF."""
+
+
+class PdfConverter:
+    """Interface of a PDF conversion backend."""
+
+    name = None
+
+    def convert(self, docx_path, pdf_path):
+        """Convert `docx_path` into `pdf_path`. Raises PdfConversionError on failure.
+
+        The backend writes a temporary file next to `pdf_path`, renamed onto it only once
+        the conversion succeeded: `pdf_path` never exists half-written (timeout, crash).
+        """
+        # Extension .pdf conservée pour les backends qui déduisent le format du nom
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pdf_path) or '.', suffix='.tmp.pdf')
+        os.close(fd)
+        try:
+            self._convert(docx_path, tmp_path)
+            if os.path.getsize(tmp_path) == 0:
+                raise PdfConversionError(f"PDF vide après la conversion de {docx_path}")
+            os.replace(tmp_path, pdf_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _convert(self, docx_path, pdf_path):
+        """Backend conversion of `docx_path`, writing `pdf_path` (a temporary file)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources held by the backend."""
+
+
+class Docx2PdfConverter(PdfConverter):
+    """Conversion through Microsoft Word (docx2pdf + COM), Windows only."""
+
+    name = 'docx2pdf'
+
+    def _convert(self, docx_path, pdf_path):
+        import pythoncom
+        from docx2pdf import convert
+
+        pythoncom.CoInitialize()
+        try:
+            convert(docx_path, pdf_path)
+        except Exception as e:
+            raise PdfConversionError(str(e)) from e
+        finally:
+            pythoncom.CoUninitialize()
+
+
+class _UnoserverWorker:
+    """One headless LibreOffice instance behind an unoserver listener."""
+
+    def __init__(self, index, port, uno_port, unoserver_path, soffice_path, startup_timeout):
+        self.index = index
+        self.port = port
+        self.uno_port = uno_port
+        self.jobs = 0
+        self._unoserver_path = unoserver_path
+        self._soffice_path = soffice_path
+        self._startup_timeout = startup_timeout
+        self._process = None
+        self._profile_dir = None
+        self.timed_out = False
+
+    def start(self):
+        # Un profil LibreOffice par instance : le profil par défaut est verrouillé
+        if self._profile_dir is None:
+            self._profile_dir = tempfile.mkdtemp(prefix=f'lo_profile_{self.index}_')
+        command = [
+            self._unoserver_path,
+            '--interface', '127.0.0.1',
+            '--port', str(self.port),
+            '--uno-port', str(self.uno_port),
+            '--user-installation', f'file://{self._profile_dir}',
+        ]
+        if self._soffice_path:
+            command += ['--executable', self._soffice_path]
+        try:
+            self._process = subprocess.Popen(
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise PdfConversionError(f"Impossible de lancer unoserver : {e}") from e
+
+        deadline = time.monotonic() + self._startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise PdfConversionError(
+                    f"unoserver s'est arrêté au démarrage (code {self._process.returncode})"
+                )
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            self.stop()
+            raise PdfConversionError(
+                f"unoserver n'a pas démarré en {self._startup_timeout} s sur le port {self.port}"
+            )
+
+        self.jobs = 0
+        self.timed_out = False
+        logger.info(f"Worker LibreOffice {self.index} démarré (port {self.port})")
+
+    def convert(self, docx_path, pdf_path, timeout):
+        try:
+            from unoserver.client import UnoClient
+        except ImportError as e:
+            raise PdfConversionError("Le paquet 'unoserver' est requis pour la conversion LibreOffice") from e
+
+        # Le client XML-RPC n'a pas de timeout : arrêter le worker débloque l'appel
+        timer = threading.Timer(timeout, self._on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            client = UnoClient(server='127.0.0.1', port=str(self.port))
+            client.convert(inpath=docx_path, outpath=pdf_path, convert_to='pdf')
+        except Exception as e:
+            if self.timed_out:
+                raise PdfConversionError(f"Conversion interrompue après {timeout} s") from e
+            raise PdfConversionError(str(e)) from e
+        finally:
+            timer.cancel()
+            self.jobs += 1
+
+    def _on_timeout(self):
+        self.timed_out = True
+        logger.warning(f"Worker LibreOffice {self.index} : délai dépassé, arrêt du processus")
+        self.stop()
+
+    def stop(self):
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        self.stop()
+        if self._profile_dir is not None:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+            self._profile_dir = None
+
+
+class LibreOfficeConverter(PdfConverter):
+    """Pool of warm headless LibreOffice instances driven through unoserver."""
+
+    name = 'libreoffice'
+
+    def __init__(self, workers=2, max_jobs_per_worker=200, job_timeout=60, base_port=2003,
+                 unoserver_path='unoserver', soffice_path=None, startup_timeout=30):
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self._workers = [
+            _UnoserverWorker(i, base_port + 2 * i, base_port + 2 * i + 1,
+                             unoserver_path, soffice_path, startup_timeout)
+            for i in range(workers)
+        ]
+        self._idle = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._started:
+                return
+            started = []
+            try:
+                for worker in self._workers:
+                    worker.start()
+                    started.append(worker)
+            except PdfConversionError:
+                # Pas de pool à moitié démarré : le prochain appel relance tous les workers
+                # sur des ports libérés
+                for worker in started:
+                    worker.stop()
+                raise
+            for worker in started:
+                self._idle.put(worker)
+            self._started = True
+
+    def _recycle(self, worker, reason):
+        logger.info(f"Recyclage du worker LibreOffice {worker.index} ({reason})")
+        worker.stop()
+        try:
+            worker.start()
+        except PdfConversionError as e:
+            # Le worker sera relancé au prochain échec de conversion
+            logger.error(f"Redémarrage du worker LibreOffice {worker.index} impossible : {e}")
+
+    def _convert(self, docx_path, pdf_path):
+        self._ensure_started()
+        # Bloque tant qu'aucun worker n'est libre
+        worker = self._idle.get()
+        try:
+            worker.convert(os.path.abspath(docx_path), os.path.abspath(pdf_path), self.job_timeout)
+        except PdfConversionError:
+            self._recycle(worker, "échec de conversion")
+            raise
+        else:
+            if worker.jobs >= self.max_jobs_per_worker:
+                self._recycle(worker, f"{worker.jobs} conversions")
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+# PDF d'une page vide, sans contenu issu du document
+_STUB_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n"
+    b"%%EOF\n"
+)
+
+
+class StubConverter(PdfConverter):
+    """Fake conversion writing a blank PDF after `delay` seconds (benchmarks, development)."""
+
+    name = 'stub'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def _convert(self, docx_path, pdf_path):
+        if not os.path.exists(docx_path):
+            raise PdfConversionError(f"Document introuvable : {docx_path}")
+        if self.delay:
+            # Durée d'une conversion réelle, sans occuper de CPU
+            time.sleep(self.delay)
+        with open(pdf_path, 'wb') as f:
+            f.write(_STUB_PDF)
+
+
+CONVERTERS = {
+    Docx2PdfConverter.name: Docx2PdfConverter,
+    LibreOfficeConverter.name: LibreOfficeConverter,
+    StubConverter.name: StubConverter,
+}
+
+
+def default_converter_name():
+    """Word on Windows, LibreOffice everywhere else."""
+    return Docx2PdfConverter.name if sys.platform == 'win32' else LibreOfficeConverter.name
+
+
+def create_converter(name, **options):
+    """Instantiate the backend registered under `name` with its `options`."""
+    try:
+        converter_class = CONVERTERS[name]
+    except KeyError:
+        raise ValueError(f"Convertisseur PDF inconnu : {name} (disponibles : {', '.join(CONVERTERS)})")
+    return converter_class(**options)
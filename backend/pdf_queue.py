@@ -0,0 +1,134 @@
+"""Bounded PDF rendering queue.
+
+A fixed number of worker threads convert DOCX files through the configured PdfConverter.
+Jobs are deduplicated by output path: submitting a PDF that is already pending or being
+converted returns the existing job. When too many jobs are waiting, submit raises
+PdfQueueFullError so callers can push back instead of piling up conversions. An optional
+on_complete callback is called from the worker thread with each finished job.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from logging_config import SAMPLED
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class PdfQueueFullError(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs."""
+
+
+class PdfJob:
+    """A DOCX to PDF conversion tracked by the queue."""
+
+    def __init__(self, docx_path, pdf_path):
+        self.docx_path = docx_path
+        self.pdf_path = pdf_path
+        self.status = PENDING
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the job is finished. Returns False if `timeout` expired first."""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class PdfJobQueue:
+    """Fixed-size pool of threads converting queued DOCX files to PDF."""
+
+    def __init__(self, converter, workers=2, max_pending=100, history_size=1000, on_complete=None):
+        self._converter = converter
+        self._on_complete = on_complete
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._active = {}
+        self._history = OrderedDict()
+        self._history_size = history_size
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        # Appelé avec self._lock verrouillé
+        if self._threads:
+            return
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f'pdf-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, docx_path, pdf_path):
+        """Queue the conversion of `docx_path`, or return the job already converting `pdf_path`."""
+        with self._lock:
+            job = self._active.get(pdf_path)
+            if job is not None:
+                return job
+            self._ensure_started()
+            job = PdfJob(docx_path, pdf_path)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise PdfQueueFullError(
+                    f"File de conversion PDF pleine ({self._queue.maxsize} en attente)"
+                )
+            self._active[pdf_path] = job
+            return job
+
+    def get(self, pdf_path):
+        """Return the active or most recent job for `pdf_path`, or None."""
+        with self._lock:
+            return self._active.get(pdf_path) or self._history.get(pdf_path)
+
+    @property
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                self._converter.convert(job.docx_path, job.pdf_path)
+                job.status = DONE
+                logger.info(f"PDF généré avec succès en arrière-plan : {job.pdf_path}",
+                            extra=SAMPLED)
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                logger.error(f"Erreur lors de la génération du PDF en arrière-plan: {str(e)}")
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._active.pop(job.pdf_path, None)
+                    self._history[job.pdf_path] = job
+                    self._history.move_to_end(job.pdf_path)
+                    while len(self._history) > self._history_size:
+                        self._history.popitem(last=False)
+                if self._on_complete is not None:
+                    try:
+                        self._on_complete(job)
+                    except Exception as e:
+                        logger.error(f"Erreur après la génération du PDF {job.pdf_path}: {str(e)}")
+                job._done.set()
+                self._queue.task_done()
@@ -0,0 +1,150 @@
+"""Premium computation for DO, TRC and RCMO guarantees.
+
+Each premium is ``cout_ouvrage * taux / 100`` when the guarantee is subscribed, and
+``prime_totale`` is their sum (same rules as the quote form). The computation works on
+NumPy arrays so a whole portfolio is priced, or repriced under rate scenarios, in one
+vectorized pass.
+"""
+import numpy as np
+
+PREMIUM_FIELDS = ['prime_do', 'prime_trc', 'prime_rcmo', 'prime_totale']
+RATE_FIELDS = ['taux_do', 'taux_trc', 'taux_rcmo']
+
+# Critères utilisables dans le 'where' d'un ajustement de scénario, avec le type de leur valeur
+SCENARIO_CRITERIA = {
+    'garantie': str, 'client_vip': bool, 'souhaite_rcmo': bool, 'presence_existant': bool,
+    'type_travaux': str, 'destination_ouvrage': str,
+}
+# Bornes des ajustements : 'delta' en points de taux, 'factor' multiplicatif
+SCENARIO_OPERAND_BOUNDS = {'delta': (-100, 100), 'factor': (0, 100)}
+
+
+def _as_float_array(values):
+    """Float array where None / NaN (rate or cost not filled in) count as 0."""
+    return np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+
+
+def compute_premiums(cout_ouvrage, taux_do, taux_trc, taux_rcmo, garantie, souhaite_rcmo):
+    """Compute the premiums of one or many quotes.
+
+    Arguments are scalars or equally sized sequences. Returns a dict of float arrays
+    keyed by PREMIUM_FIELDS.
+    """
+    cout = _as_float_array(cout_ouvrage)
+    garantie = np.asarray(garantie, dtype=object)
+    has_do = (garantie == 'DO') | (garantie == 'DO+TRC')
+    has_trc = (garantie == 'TRC') | (garantie == 'DO+TRC')
+    has_rcmo = np.asarray(souhaite_rcmo, dtype=object).astype(bool)
+
+    prime_do = np.where(has_do, cout * _as_float_array(taux_do) / 100, 0.0)
+    prime_trc = np.where(has_trc, cout * _as_float_array(taux_trc) / 100, 0.0)
+    prime_rcmo = np.where(has_rcmo, cout * _as_float_array(taux_rcmo) / 100, 0.0)
+
+    return {
+        'prime_do': prime_do,
+        'prime_trc': prime_trc,
+        'prime_rcmo': prime_rcmo,
+        'prime_totale': prime_do + prime_trc + prime_rcmo,
+    }
+
+
+def price_devis(fields):
+    """Return the premiums of a single quote given its column values."""
+    premiums = compute_premiums(
+        fields.get('cout_ouvrage'), fields.get('taux_do'), fields.get('taux_trc'),
+        fields.get('taux_rcmo'), fields.get('garantie'), fields.get('souhaite_rcmo')
+    )
+    return {field: float(value) for field, value in premiums.items()}
+
+
+def validate_scenarios(scenarios):
+    """Check the structure of what-if scenarios. Returns a dict of errors (empty if valid)."""
+    errors = {}
+    if not isinstance(scenarios, list) or not scenarios:
+        return {'scenarios': "Le champ 'scenarios' doit être une liste non vide"}
+
+    for i, scenario in enumerate(scenarios):
+        prefix = f"scenarios[{i}]"
+        if not isinstance(scenario, dict):
+            errors[prefix] = "Un scénario doit être un objet"
+            continue
+        adjustments = scenario.get('adjustments')
+        if not isinstance(adjustments, list) or not adjustments:
+            errors[f"{prefix}.adjustments"] = "Le champ 'adjustments' doit être une liste non vide"
+            continue
+        for j, adjustment in enumerate(adjustments):
+            key = f"{prefix}.adjustments[{j}]"
+            if not isinstance(adjustment, dict):
+                errors[key] = "Un ajustement doit être un objet"
+                continue
+            if adjustment.get('taux') not in RATE_FIELDS:
+                errors[f"{key}.taux"] = f"Le taux doit être l'un de : {', '.join(RATE_FIELDS)}"
+            for operand, (low, high) in SCENARIO_OPERAND_BOUNDS.items():
+                if operand not in adjustment:
+                    continue
+                value = adjustment[operand]
+                # La comparaison écarte aussi NaN et l'infini
+                if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                        or not low <= value <= high:
+                    errors[f"{key}.{operand}"] = \
+                        f"Le champ '{operand}' doit être un nombre entre {low} et {high}"
+            if 'delta' not in adjustment and 'factor' not in adjustment:
+                errors[key] = "Un ajustement doit contenir 'delta' (points) ou 'factor'"
+            where = adjustment.get('where', {})
+            if not isinstance(where, dict) or any(c not in SCENARIO_CRITERIA for c in where):
+                errors[f"{key}.where"] = f"Critères possibles : {', '.join(SCENARIO_CRITERIA)}"
+                continue
+            for criterion, expected in where.items():
+                expected_type = SCENARIO_CRITERIA[criterion]
+                # Une seule valeur par critère, du type de la colonne
+                if type(expected) is not expected_type:
+                    type_name = 'un booléen' if expected_type is bool else 'une chaîne'
+                    errors[f"{key}.where.{criterion}"] = f"Le critère '{criterion}' doit être {type_name}"
+    return errors
+
+
+class Portfolio:
+    """Column arrays of a set of quotes, ready for vectorized repricing."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.size = len(columns['cout_ouvrage'])
+        self.rates = {field: _as_float_array(columns[field]) for field in RATE_FIELDS}
+
+    @classmethod
+    def from_rows(cls, rows, column_names):
+        """Build a portfolio from row tuples whose values follow `column_names`."""
+        transposed = list(zip(*rows)) if rows else [()] * len(column_names)
+        return cls({
+            name: np.asarray(values, dtype=object)
+            for name, values in zip(column_names, transposed)
+        })
+
+    def _mask(self, where):
+        mask = np.ones(self.size, dtype=bool)
+        for criterion, expected in where.items():
+            mask &= self.columns[criterion] == expected
+        return mask
+
+    def price(self, rates=None):
+        rates = rates or self.rates
+        return compute_premiums(
+            self.columns['cout_ouvrage'], rates['taux_do'], rates['taux_trc'],
+            rates['taux_rcmo'], self.columns['garantie'], self.columns['souhaite_rcmo']
+        )
+
+    def reprice(self, adjustments):
+        """Apply rate adjustments in order and return the resulting premiums."""
+        rates = {field: values.copy() for field, values in self.rates.items()}
+        for adjustment in adjustments:
+            mask = self._mask(adjustment.get('where', {}))
+            rate = rates[adjustment['taux']]
+            rate[mask] = rate[mask] * adjustment.get('factor', 1) + adjustment.get('delta', 0)
+            # Un taux ne peut pas devenir négatif
+            np.maximum(rate, 0, out=rate)
+        return self.price(rates)
+
+
+def summarize(premiums):
+    """Sum each premium array, rounded to the cent."""
+    return {field: round(float(premiums[field].sum()), 2) for field in PREMIUM_FIELDS}
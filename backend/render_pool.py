@@ -0,0 +1,94 @@
+"""Process pool rendering compiled DOCX templates on every core.
+
+Filling a template is pure Python and holds the GIL, so threads of one process render at
+most one core's worth of documents. RenderPool hands renders to worker processes: each
+worker compiles all the templates when it starts (warm), keeps them in its own
+TemplateCache, and is replaced after `max_jobs_per_worker` renders to bound its memory.
+Workers are started with the 'spawn' method, which is the only one available on Windows
+and is safe in a process already running threads.
+
+A worker reads the template from disk, so each job carries the digest of the caller's
+compiled template: if the file changed in between, the worker refuses the job and the
+caller renders it in-process, keeping the document consistent with its recorded key.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+
+from docx_template import TemplateCache
+
+logger = logging.getLogger(__name__)
+
+# Cache de templates propre à chaque processus de rendu
+_worker_cache = None
+
+
+def _init_worker(placeholders, template_paths):
+    global _worker_cache
+    _worker_cache = TemplateCache(placeholders)
+    _worker_cache.preload(template_paths)
+
+
+class TemplateChangedError(Exception):
+    """The template file no longer matches the digest of the caller's compiled template."""
+
+
+def _render(template_path, digest, values, filepath):
+    template = _worker_cache.get(template_path)
+    if template.digest != digest:
+        raise TemplateChangedError(f"Template modifié depuis sa compilation : {template_path}")
+    template.save(values, filepath)
+
+
+class RenderPool:
+    """Pool of warm worker processes saving rendered templates to files."""
+
+    def __init__(self, placeholders, template_paths, workers=None, max_jobs_per_worker=500,
+                 timeout=60):
+        self._placeholders = tuple(placeholders)
+        self._template_paths = list(template_paths)
+        self._workers = workers or os.cpu_count() or 1
+        self._max_jobs_per_worker = max_jobs_per_worker
+        self._timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def start(self):
+        """Start the worker processes, which compile the templates before their first job."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            context = multiprocessing.get_context('spawn')
+            self._pool = context.Pool(
+                processes=self._workers,
+                initializer=_init_worker,
+                initargs=(self._placeholders, self._template_paths),
+                maxtasksperchild=self._max_jobs_per_worker,
+            )
+            logger.info(f"Pool de rendu démarré : {self._workers} processus")
+
+    def save(self, template, values, filepath):
+        """Render `template` (a CompiledTemplate of the caller) with `values` into `filepath`."""
+        self.start()
+        try:
+            # L'attente libère le GIL : chaque thread appelant occupe un processus de rendu
+            self._pool.apply_async(
+                _render, (template.path, template.digest, values, filepath)
+            ).get(self._timeout)
+        except TemplateChangedError:
+            # Le processus a lu une autre version du fichier : rendu sur place avec celle de
+            # l'appelant, dont le digest est dans la clé du document
+            logger.info(f"Template {template.path} modifié pendant le rendu : rendu dans le processus")
+            template.save(values, filepath)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
@@ -0,0 +1,167 @@
+"""Durable background rendering of devis documents.
+
+Render requests are rows of the render_job table, written in the same transaction as the
+devis they belong to, so a document to produce is never lost on a restart. Worker threads
+claim pending rows with a conditional UPDATE (safe with several processes), run the render
+callback and record the outcome. A devis modified while its job runs is put back to
+pending, and the stale result is not recorded as done. An optional on_complete callback
+is called with the devis id and the recorded status once the outcome is recorded.
+"""
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def enqueue(session, table, devis_ids):
+    """Request the rendering of `devis_ids` within the current transaction of `session`."""
+    devis_ids = list(devis_ids)
+    if not devis_ids:
+        return
+    now = _now()
+    existing = set(session.execute(
+        sa.select(table.c.devis_id).where(table.c.devis_id.in_(devis_ids))
+    ).scalars())
+    if existing:
+        session.execute(
+            table.update().where(table.c.devis_id.in_(existing)).values(
+                status=PENDING, attempts=0, error=None, requested_at=now, updated_at=now
+            )
+        )
+    new_ids = [devis_id for devis_id in devis_ids if devis_id not in existing]
+    if new_ids:
+        session.execute(table.insert(), [
+            {'devis_id': devis_id, 'status': PENDING, 'attempts': 0,
+             'requested_at': now, 'updated_at': now}
+            for devis_id in new_ids
+        ])
+
+
+class RenderJobQueue:
+    """Threads rendering the devis documents requested in the render_job table.
+
+    `render(devis_id)` produces the documents of a devis and raises on failure. A job left
+    running for more than `stale_after` seconds (process killed) is claimed again.
+    """
+
+    def __init__(self, engine, table, render, workers=2, poll_interval=5, max_attempts=3,
+                 stale_after=600, on_complete=None):
+        self._engine = engine
+        self._on_complete = on_complete
+        self._table = table
+        self._render = render
+        self._workers = workers
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._stale_after = stale_after
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f'render-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def notify(self):
+        """Wake the workers up after new jobs have been committed."""
+        self._wakeup.set()
+
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        with self._engine.connect() as connection:
+            return connection.execute(
+                sa.select(sa.func.count()).select_from(self._table)
+                .where(self._table.c.status == PENDING)
+            ).scalar()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Erreur lors de la lecture de la file de rendu : {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+                continue
+            self._process(job)
+
+    def _claim(self):
+        """Mark the oldest pending job as running. Returns it, or None if there is none."""
+        table = self._table
+        now = _now()
+        candidates_query = (
+            sa.select(table.c.id, table.c.devis_id, table.c.requested_at, table.c.attempts)
+            .where(table.c.status == PENDING)
+            .order_by(table.c.requested_at)
+            .limit(self._workers)
+        )
+        with self._engine.begin() as connection:
+            for job in connection.execute(candidates_query).all():
+                claimed = connection.execute(
+                    table.update().where(
+                        table.c.id == job.id, table.c.status == PENDING,
+                        table.c.requested_at == job.requested_at
+                    ).values(status=RUNNING, attempts=table.c.attempts + 1, updated_at=now)
+                ).rowcount
+                if claimed:
+                    return job
+
+            # File vide : reprendre les jobs abandonnés par un processus arrêté en cours de rendu
+            connection.execute(
+                table.update().where(
+                    table.c.status == RUNNING,
+                    table.c.updated_at < now - timedelta(seconds=self._stale_after)
+                ).values(status=PENDING)
+            )
+        return None
+
+    def _process(self, job):
+        table = self._table
+        try:
+            self._render(job.devis_id)
+            values = {'status': DONE, 'error': None}
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération des documents du devis {job.devis_id}: {str(e)}")
+            values = {'status': FAILED, 'error': str(e)}
+            if job.attempts + 1 < self._max_attempts:
+                # Nouvel essai après les jobs déjà en attente
+                values.update(status=PENDING, requested_at=_now())
+        try:
+            with self._engine.begin() as connection:
+                # Sans effet si le devis a été modifié pendant le rendu : le job est à refaire
+                connection.execute(
+                    table.update().where(
+                        table.c.id == job.id, table.c.status == RUNNING,
+                        table.c.requested_at == job.requested_at
+                    ).values(updated_at=_now(), **values)
+                )
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement du rendu du devis {job.devis_id}: {str(e)}")
+            return
+        if self._on_complete is not None:
+            try:
+                self._on_complete(job.devis_id, values['status'])
+            except Exception as e:
+                logger.error(f"Erreur après le rendu du devis {job.devis_id}: {str(e)}")
@@ -0,0 +1,55 @@
+"""Short-lived in-memory cache of computed responses.
+
+Entries expire after `ttl` seconds and the whole cache is invalidated at once by
+invalidate(), called after every write. A reader captures `generation` before querying
+the database and passes it to set(): a value computed before a concurrent write is then
+dropped instead of being cached. The cache is local to the process, so with several
+processes a write made elsewhere is seen once the entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a time-to-live and global invalidation."""
+
+    def __init__(self, ttl=10, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value of `key`, or None if it is missing or expired."""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        """Cache `value` unless the cache was invalidated since `generation` was read."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every entry, after a write."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
@@ -0,0 +1,152 @@
+"""Premium totals of the portfolio, maintained incrementally in a rollup table.
+
+The rollup table holds one row per combination of ROLLUP_DIMENSIONS (garantie,
+type_travaux, destination_ouvrage, month of date_creation, client_vip) with the number of
+devis and the sum of each premium. Writes add the contribution of the new values and
+subtract the one of the old values, in the transaction of the devis itself; aggregation
+queries then GROUP BY over a few thousand rollup rows instead of the whole devis table.
+Missing text dimensions are stored as '' so every row has a unique, non-NULL key.
+"""
+from collections import defaultdict
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+from pricing import PREMIUM_FIELDS
+
+ROLLUP_DIMENSIONS = ['garantie', 'type_travaux', 'destination_ouvrage', 'month', 'client_vip']
+TEXT_DIMENSIONS = ['garantie', 'type_travaux', 'destination_ouvrage']
+
+
+def _dialect_name(executor):
+    """Dialect of a Session or a Connection."""
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    return bind.dialect.name
+
+
+def month_of(date):
+    return date.strftime('%Y-%m') if date is not None else ''
+
+
+def bucket_key(fields):
+    """Rollup key of a devis given its column values."""
+    return (
+        fields.get('garantie') or '',
+        fields.get('type_travaux') or '',
+        fields.get('destination_ouvrage') or '',
+        month_of(fields.get('date_creation')),
+        bool(fields.get('client_vip')),
+    )
+
+
+def contributions(rows, sign=1):
+    """Sum the contributions of devis column dicts per rollup key, with `sign` +1 or -1."""
+    deltas = defaultdict(lambda: [0] + [0.0] * len(PREMIUM_FIELDS))
+    for fields in rows:
+        delta = deltas[bucket_key(fields)]
+        delta[0] += sign
+        for i, field in enumerate(PREMIUM_FIELDS, start=1):
+            delta[i] += sign * (fields.get(field) or 0.0)
+    return deltas
+
+
+def merge(*all_deltas):
+    """Add up several results of contributions()."""
+    merged = contributions([])
+    for deltas in all_deltas:
+        for key, delta in deltas.items():
+            merged[key] = [a + b for a, b in zip(merged[key], delta)]
+    return merged
+
+
+def apply(session, table, deltas):
+    """Add `deltas` to the rollup rows within the current transaction (upsert)."""
+    rows = [
+        {**dict(zip(ROLLUP_DIMENSIONS, key)), 'devis_count': delta[0],
+         **dict(zip(PREMIUM_FIELDS, delta[1:]))}
+        for key, delta in deltas.items()
+        if any(delta)
+    ]
+    if not rows:
+        return
+    dialect = _dialect_name(session)
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=ROLLUP_DIMENSIONS,
+        set_={
+            column: table.c[column] + statement.excluded[column]
+            for column in ['devis_count'] + PREMIUM_FIELDS
+        },
+    )
+    session.execute(statement, rows)
+
+
+def month_expression(column, dialect):
+    """SQL expression of the 'YYYY-MM' month of a datetime column."""
+    if dialect == 'postgresql':
+        return sa.func.to_char(column, 'YYYY-MM')
+    return sa.func.strftime('%Y-%m', column)
+
+
+def rebuild(session, table, devis_table):
+    """Recompute the whole rollup table from the devis table (within the current transaction).
+
+    `session` may also be a Connection, as in the migration creating the table.
+    """
+    dialect = _dialect_name(session)
+    devis = devis_table.c
+    keys = [
+        *[sa.func.coalesce(devis[name], '') for name in TEXT_DIMENSIONS],
+        sa.func.coalesce(month_expression(devis.date_creation, dialect), ''),
+        sa.func.coalesce(devis.client_vip, sa.false()),
+    ]
+    select = sa.select(
+        *[key.label(name) for key, name in zip(keys, ROLLUP_DIMENSIONS)],
+        sa.func.count().label('devis_count'),
+        *[sa.func.coalesce(sa.func.sum(devis[field]), 0.0).label(field) for field in PREMIUM_FIELDS],
+    ).group_by(*keys)
+    session.execute(table.delete())
+    session.execute(table.insert().from_select(ROLLUP_DIMENSIONS + ['devis_count'] + PREMIUM_FIELDS, select))
+
+
+def aggregate(session, table, group_by, filters):
+    """Sum the rollup rows grouped by the `group_by` dimensions.
+
+    `filters` maps a dimension to an exact value, plus optional 'month_min' / 'month_max'.
+    Returns (groups, totals) with the premiums rounded to the cent.
+    """
+    conditions = [table.c.devis_count != 0]
+    for name, value in filters.items():
+        if name == 'month_min':
+            conditions.append(table.c.month >= value)
+        elif name == 'month_max':
+            conditions.append(table.c.month <= value)
+        else:
+            conditions.append(table.c[name] == value)
+
+    measures = [sa.func.sum(table.c.devis_count).label('count')] + [
+        sa.func.sum(table.c[field]).label(field) for field in PREMIUM_FIELDS
+    ]
+    group_columns = [table.c[name] for name in group_by]
+    rows = session.execute(
+        sa.select(*group_columns, *measures).where(*conditions)
+        .group_by(*group_columns).order_by(*group_columns)
+    ).all()
+
+    groups = []
+    totals = dict.fromkeys(['count'] + PREMIUM_FIELDS, 0)
+    for row in rows:
+        values = row._mapping
+        group = {
+            name: (values[name] or None) if name in TEXT_DIMENSIONS or name == 'month' else values[name]
+            for name in group_by
+        }
+        group['count'] = int(values['count'])
+        totals['count'] += group['count']
+        for field in PREMIUM_FIELDS:
+            group[field] = round(values[field] or 0.0, 2)
+            totals[field] += values[field] or 0.0
+        groups.append(group)
+    totals.update({field: round(totals[field], 2) for field in PREMIUM_FIELDS})
+    return groups, totals
@@ -0,0 +1,46 @@
+"""Full-text search over the devis.
+
+SQLite uses the devis_fts FTS5 table and PostgreSQL the search_vector column, both created
+by migration 6 and kept in sync by the database itself (triggers, generated column). Every
+word of the query must match, as a prefix ("dup lyo" finds "Dupont, Lyon"), and results
+are ranked by relevance: numero_opportunite and nom_client weigh more than the address,
+which weighs more than the description.
+"""
+import re
+
+import sqlalchemy as sa
+
+# Poids BM25 (SQLite) des colonnes de devis_fts, dans l'ordre de migrations.SEARCH_COLUMNS
+FTS_WEIGHTS = (10.0, 10.0, 4.0, 1.0)
+MAX_TERMS = 10
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(text):
+    """Words of a search query; FTS operators and punctuation are ignored."""
+    return _WORD.findall(text or '')[:MAX_TERMS]
+
+
+def search_statement(dialect, devis_table, columns, terms):
+    """select() of `columns` plus a 'score' column for the devis matching all `terms`, best first."""
+    if dialect == 'postgresql':
+        vector = sa.literal_column('devis.search_vector')
+        query = sa.func.to_tsquery('simple', ' & '.join(f"{term.lower()}:*" for term in terms))
+        score = sa.func.ts_rank(vector, query)
+        return (
+            sa.select(*columns, score.label('score'))
+            .where(vector.op('@@')(query))
+            .order_by(score.desc(), devis_table.c.id.desc())
+        )
+
+    fts = sa.table('devis_fts', sa.column('rowid'))
+    match = ' '.join(f'"{term}"*' for term in terms)
+    # bm25 est négatif : plus il est petit, plus le devis est pertinent
+    rank = sa.func.bm25(sa.literal_column('devis_fts'), *FTS_WEIGHTS)
+    return (
+        sa.select(*columns, (-rank).label('score'))
+        .select_from(fts.join(devis_table, devis_table.c.id == fts.c.rowid))
+        .where(sa.literal_column('devis_fts').op('MATCH')(match))
+        .order_by(rank, devis_table.c.id.desc())
+    )
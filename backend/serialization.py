@@ -0,0 +1,69 @@
+"""Serializers generated from SQLAlchemy column metadata.
+
+A ColumnSerializer reads a table's columns once and builds, for a given field selection,
+the list of columns to query and a function turning result rows (plain tuples from
+``session.execute(select(...))``) into dicts. No ORM instance is needed on the read path.
+"""
+import json
+
+from sqlalchemy import DateTime
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json standard
+    orjson = None
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def dumps(obj):
+    """Encode `obj` to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ColumnSerializer:
+    """Serialize the rows of a table from its column metadata."""
+
+    def __init__(self, table):
+        self.table = table
+        self.field_names = [column.name for column in table.columns]
+        # Conversion à appliquer par colonne (None : valeur JSON native)
+        self._converters = {
+            column.name: _isoformat if isinstance(column.type, DateTime) else None
+            for column in table.columns
+        }
+
+    def parse_fields(self, value):
+        """Parse a ?fields=a,b,c parameter. Returns (fields, unknown field names)."""
+        if not value:
+            return list(self.field_names), []
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        return fields, [name for name in fields if name not in self._converters]
+
+    def columns(self, fields, extra=()):
+        """Columns to select to serialize `fields`, plus the `extra` ones needed by the query."""
+        names = list(dict.fromkeys(list(fields) + list(extra)))
+        return [self.table.c[name] for name in names]
+
+    def row_serializer(self, fields, selected_columns):
+        """Return a function serializing a result row of `selected_columns` into a dict of `fields`."""
+        positions = {column.name: i for i, column in enumerate(selected_columns)}
+        plan = [(name, positions[name], self._converters[name]) for name in fields]
+
+        def serialize(row):
+            return {
+                name: converter(row[i]) if converter is not None else row[i]
+                for name, i, converter in plan
+            }
+        return serialize
+
+    def serialize_object(self, obj):
+        """Serialize an ORM instance of the table with all its columns."""
+        return {
+            name: converter(getattr(obj, name)) if converter is not None else getattr(obj, name)
+            for name, converter in self._converters.items()
+        }
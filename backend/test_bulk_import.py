@@ -0,0 +1,57 @@
+import json
+
+from conftest import DEVIS_DATA, tarification
+
+
+def post_jsonl(client, records):
+    body = '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+    return client.post('/api/devis/bulk', data=body.encode(), content_type='application/x-ndjson')
+
+
+def test_jsonl_import_rejects_invalid_records_individually(client):
+    response = post_jsonl(client, [
+        {**DEVIS_DATA, 'numero_opportunite': 'BULK-1'},
+        {**DEVIS_DATA, 'client_vip': 'oui'},
+        {**DEVIS_DATA, 'numero_opportunite': 'BULK-3', 'taux_do': '1,5', 'cout_ouvrage': '200000'},
+        {**DEVIS_DATA, 'montant_dm': [1000]},
+        {**DEVIS_DATA, 'nom_client': {'nom': 'Dupont'}},
+        '{pas du json',
+        {**DEVIS_DATA, 'numero_opportunite': 12345},
+    ])
+    assert response.status_code == 200
+    body = response.json
+    assert (body['total'], body['created'], body['failed']) == (7, 3, 4)
+
+    results = {result['row']: result for result in body['results']}
+    assert [row for row, result in results.items() if result['status'] == 'created'] == [1, 3, 7]
+    assert set(results[2]['details']) == {'client_vip'}
+    assert set(results[4]['details']) == {'montant_dm'}
+    assert set(results[5]['details']) == {'nom_client'}
+    assert set(results[6]['details']) == {'ligne'}
+
+    with tarification.app.app_context():
+        devis = tarification.db.session.get(tarification.Devis, results[3]['id'])
+        assert (devis.taux_do, devis.cout_ouvrage, devis.prime_do) == (1.5, 200000.0, 3000.0)
+        assert tarification.db.session.get(tarification.Devis, results[7]['id']).numero_opportunite == '12345'
+
+
+def test_database_error_fails_only_its_row(client, monkeypatch):
+    # Contrainte simulée sur un seul devis : le reste du lot doit être inséré
+    original_execute = tarification.db.session.execute
+
+    def execute(statement, params=None, *args, **kwargs):
+        if isinstance(params, list) and any(p.get('nom_client') == 'Refusé' for p in params):
+            raise tarification.IntegrityError('INSERT ...', params, Exception('contrainte'))
+        return original_execute(statement, params, *args, **kwargs)
+
+    monkeypatch.setattr(tarification.db.session, 'execute', execute)
+    response = post_jsonl(client, [
+        {**DEVIS_DATA, 'nom_client': 'Accepté'},
+        {**DEVIS_DATA, 'nom_client': 'Refusé'},
+        {**DEVIS_DATA, 'nom_client': 'Accepté aussi'},
+    ])
+    monkeypatch.undo()
+
+    results = response.json['results']
+    assert [result['status'] for result in results] == ['created', 'error', 'created']
+    assert results[1]['details'] == {'base': "Erreur lors de l'insertion du devis"}
@@ -0,0 +1,98 @@
+import pytest
+import sqlalchemy as sa
+
+from conftest import tarification
+
+
+def current_version(client):
+    return client.get('/api/devis/changes?limit=1').json['version']
+
+
+def changes(client, since, **params):
+    response = client.get('/api/devis/changes', query_string={'since': since, **params})
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_changes_after_create_and_update(client, create_devis):
+    since = current_version(client)
+    first = create_devis()
+    second = create_devis()
+    client.patch(f'/api/devis/{first}', json={'nom_client': 'Modifié'})
+
+    body = changes(client, since, fields='id,nom_client')
+    # Une ligne par devis, à la version de sa dernière écriture
+    assert [change['id'] for change in body['changes']] == [second, first]
+    assert body['changes'][1]['devis'] == {'id': first, 'nom_client': 'Modifié'}
+    assert body['cursor'] == body['version'] == body['changes'][-1]['version']
+    assert changes(client, body['cursor'])['changes'] == []
+
+
+def test_changes_paging(client, create_devis):
+    since = current_version(client)
+    created = [create_devis() for _ in range(5)]
+
+    seen, cursor, pages = [], since, 0
+    while True:
+        body = changes(client, cursor, limit=2)
+        seen += [change['id'] for change in body['changes']]
+        cursor = body['cursor']
+        pages += 1
+        if not body['has_more']:
+            break
+    assert seen == created
+    assert pages == 3
+
+
+def test_deleted_devis_is_a_tombstone(client):
+    since = current_version(client)
+    # Écritures directes (hors API), comme une suppression faite en base
+    with tarification.app.app_context():
+        devis_id = tarification.db.session.execute(sa.text(
+            "INSERT INTO devis (numero_opportunite, nom_client, date_creation, garantie) "
+            "VALUES ('OPP-SUPPR', 'Supprimé', CURRENT_TIMESTAMP, 'DO') RETURNING id"
+        )).scalar()
+        tarification.db.session.commit()
+        tarification.db.session.execute(sa.text("DELETE FROM devis WHERE id = :id"), {'id': devis_id})
+        tarification.db.session.commit()
+
+    body = changes(client, since)
+    assert body['changes'] == [
+        {'version': body['version'], 'id': devis_id, 'deleted': True, 'devis': None}
+    ]
+
+
+def test_list_returns_version(client, create_devis):
+    create_devis()
+    assert client.get('/api/devis').json['version'] == current_version(client)
+
+
+@pytest.mark.parametrize('path', ['/api/devis/changes', '/api/devis/changes/stream'])
+def test_since_beyond_version_is_gone(client, path):
+    version = current_version(client)
+    response = client.get(path, query_string={'since': version + 1})
+    assert response.status_code == 410
+    assert response.json['details'] == {'since': version + 1, 'version': version}
+
+
+@pytest.mark.parametrize('params', [{'since': -1}, {'since': 'abc'}, {'limit': 0}, {'fields': 'inconnu'}])
+def test_invalid_changes_params(client, params):
+    assert client.get('/api/devis/changes', query_string=params).status_code == 400
+
+
+def test_stream_resumes_after_last_event_id(client, create_devis):
+    create_devis()
+    since = current_version(client)
+    devis_id = create_devis()
+
+    response = client.get('/api/devis/changes/stream?fields=id', headers={'Last-Event-ID': str(since)})
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    try:
+        assert next(chunks).startswith(b'retry:')
+        event = next(chunks).decode()
+    finally:
+        response.close()
+    assert event.startswith('event: change\n')
+    assert f'id: {since + 1}\n' in event
+    assert f'"devis":{{"id":{devis_id}}}' in event
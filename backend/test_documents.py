@@ -0,0 +1,38 @@
+import os
+
+from conftest import tarification
+
+
+def current_artifact_path(devis_id, kind):
+    with tarification.app.app_context():
+        return tarification.get_artifact(devis_id, kind).path
+
+
+def test_docx_download(client, create_devis):
+    devis_id = create_devis()
+    response = client.get(f'/api/devis/{devis_id}/docx')
+    assert response.status_code == 200
+    assert response.data[:2] == b'PK'
+
+
+def test_missing_docx_is_rendered_again(client, create_devis):
+    devis_id = create_devis(nom_client='Fichier supprimé')
+    assert client.get(f'/api/devis/{devis_id}/docx').status_code == 200
+    path = current_artifact_path(devis_id, 'docx')
+    os.remove(path)
+    tarification.response_cache.invalidate()
+
+    response = client.get(f'/api/devis/{devis_id}/docx')
+    assert response.status_code == 200
+    assert os.path.exists(path)
+
+
+def test_pdf_download_leaves_no_temporary_file(client, create_devis):
+    devis_id = create_devis(nom_client='Client PDF')
+    response = client.get(f'/api/devis/{devis_id}/pdf')
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+
+    # Le PDF est rangé à côté du DOCX (même hash), son artifact est enregistré après coup
+    directory = os.path.dirname(current_artifact_path(devis_id, 'docx'))
+    assert not [name for name in os.listdir(directory) if '.tmp' in name]
@@ -0,0 +1,50 @@
+import glob
+import io
+import os
+
+import pytest
+from docx import Document
+
+from conftest import tarification
+from docx_template import _iter_paragraphs, compile_template
+
+TEMPLATE_PATHS = sorted(glob.glob(os.path.join(tarification.TEMPLATE_DIR, '*.docx')))
+
+
+def sample_values(**overrides):
+    values = {
+        key: f"Valeur {i} : é & <b> \"guillemets\" 'apostrophe'"
+        for i, key in enumerate(tarification.TEMPLATE_PLACEHOLDERS)
+    }
+    values['description_ouvrage'] = "Première ligne\nSeconde ligne\tavec tabulation"
+    values['nom_client'] = "  Espaces conservés  "
+    values.update(overrides)
+    return values
+
+
+def paragraph_texts(doc):
+    return [paragraph.text for paragraph in _iter_paragraphs(doc)]
+
+
+@pytest.mark.parametrize('template_path', TEMPLATE_PATHS, ids=os.path.basename)
+def test_compiled_render_matches_python_docx(template_path):
+    values = sample_values()
+    reference = Document(template_path)
+    tarification.replace_placeholders_in_doc(reference, values)
+
+    template = compile_template(template_path, tarification.TEMPLATE_PLACEHOLDERS)
+    rendered = Document(io.BytesIO(template.render(values)))
+
+    assert template.placeholders
+    assert paragraph_texts(rendered) == paragraph_texts(reference)
+
+
+def test_invalid_xml_characters_are_dropped():
+    template = compile_template(TEMPLATE_PATHS[0], tarification.TEMPLATE_PLACEHOLDERS)
+    values = sample_values(description_ouvrage="Ouvrage\x0b à\x00 étages\x0c\ufffe")
+    # Le document produit doit rester lisible par Word (et python-docx)
+    rendered = Document(io.BytesIO(template.render(values)))
+
+    texts = paragraph_texts(rendered)
+    assert any("Ouvrage à étages" in text for text in texts)
+    assert not any(char in text for text in texts for char in "\x0b\x00\x0c\ufffe")
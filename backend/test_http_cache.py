@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from conftest import tarification
+from response_cache import ResponseCache
+
+
+def test_cache_drops_value_computed_before_invalidation():
+    cache = ResponseCache(ttl=60)
+    generation = cache.generation
+    cache.invalidate()
+    cache.set('detail:1', 'ancien', generation)
+    assert cache.get('detail:1') is None
+
+    cache.set('detail:1', 'nouveau', cache.generation)
+    assert cache.get('detail:1') == 'nouveau'
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    cache.set('a', 1, cache.generation)
+    cache.set('b', 2, cache.generation)
+    cache.get('a')
+    cache.set('c', 3, cache.generation)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_cache_disabled_with_zero_ttl():
+    cache = ResponseCache(ttl=0)
+    cache.set('a', 1, cache.generation)
+    assert cache.get('a') is None
+
+
+def test_detail_if_none_match(client, create_devis):
+    devis_id = create_devis()
+    response = client.get(f'/api/devis/{devis_id}')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get(f'/api/devis/{devis_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_detail_has_no_last_modified(client, create_devis):
+    # L'état du rendu change sans modifier date_creation : seul l'ETag le reflète
+    devis_id = create_devis()
+    response = client.get(f'/api/devis/{devis_id}')
+    assert 'Last-Modified' not in response.headers
+
+    now = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    response = client.get(f'/api/devis/{devis_id}', headers={'If-Modified-Since': now})
+    assert response.status_code == 200
+
+
+def test_render_status_change_changes_etag(client, create_devis):
+    devis_id = create_devis()
+    response = client.get(f'/api/devis/{devis_id}')
+    assert response.json['render_status']['status'] == 'pending'
+    etag = response.headers['ETag']
+
+    # Rendu terminé par un worker : le devis lui-même n'est pas modifié
+    jobs = tarification.RenderJob.__table__
+    with tarification.app.app_context():
+        tarification.db.session.execute(
+            jobs.update().where(jobs.c.devis_id == devis_id).values(status='done')
+        )
+        tarification.db.session.commit()
+    tarification.response_cache.invalidate()
+
+    response = client.get(f'/api/devis/{devis_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['render_status']['status'] == 'done'
+
+
+def test_docx_if_modified_since(client, create_devis):
+    devis_id = create_devis()
+    last_modified = client.get(f'/api/devis/{devis_id}/docx').headers['Last-Modified']
+    response = client.get(f'/api/devis/{devis_id}/docx', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    earlier = format_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc), usegmt=True)
+    response = client.get(f'/api/devis/{devis_id}/docx', headers={'If-Modified-Since': earlier})
+    assert response.status_code == 200
+
+
+def test_update_changes_etag(client, create_devis):
+    devis_id = create_devis()
+    etag = client.get(f'/api/devis/{devis_id}').headers['ETag']
+    list_etag = client.get('/api/devis').headers['ETag']
+
+    assert client.patch(f'/api/devis/{devis_id}', json={'nom_client': 'Autre client'}).status_code == 200
+
+    response = client.get(f'/api/devis/{devis_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['nom_client'] == 'Autre client'
+    assert client.get('/api/devis', headers={'If-None-Match': list_etag}).status_code == 200
+
+
+def test_docx_etag_is_content_hash(client, create_devis):
+    devis_id = create_devis()
+    response = client.get(f'/api/devis/{devis_id}/docx')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get(f'/api/devis/{devis_id}/docx', headers={'If-None-Match': etag})
+    assert response.status_code == 304
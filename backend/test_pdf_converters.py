@@ -0,0 +1,78 @@
+import pytest
+
+import pdf_converters
+from pdf_converters import LibreOfficeConverter, PdfConversionError
+
+
+class FakeWorker:
+    """_UnoserverWorker replacement recording its start / stop calls."""
+
+    fail_index = None
+
+    def __init__(self, index, *args):
+        self.index = index
+        self.running = False
+
+    def start(self):
+        if self.index == FakeWorker.fail_index:
+            raise PdfConversionError("unoserver n'a pas démarré")
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+@pytest.fixture
+def converter(monkeypatch):
+    monkeypatch.setattr(pdf_converters, '_UnoserverWorker', FakeWorker)
+    FakeWorker.fail_index = None
+    return LibreOfficeConverter(workers=3)
+
+
+def test_failed_start_stops_started_workers(converter):
+    FakeWorker.fail_index = 2
+    with pytest.raises(PdfConversionError):
+        converter._ensure_started()
+    assert [worker.running for worker in converter._workers] == [False, False, False]
+    assert converter._idle.empty()
+
+    FakeWorker.fail_index = None
+    converter._ensure_started()
+    assert [worker.running for worker in converter._workers] == [True, True, True]
+    assert converter._idle.qsize() == 3
+
+
+class PartialConverter(pdf_converters.PdfConverter):
+    """Backend writing part of the PDF, then failing or checking the final path."""
+
+    def __init__(self, fail):
+        self.fail = fail
+
+    def _convert(self, docx_path, pdf_path):
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4 (tronque)')
+        if self.fail:
+            raise PdfConversionError("délai dépassé")
+
+
+def test_failed_conversion_leaves_no_file(tmp_path):
+    pdf_path = tmp_path / 'document.pdf'
+    with pytest.raises(PdfConversionError):
+        PartialConverter(fail=True).convert(str(tmp_path / 'document.docx'), str(pdf_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_conversion_is_renamed_onto_pdf_path(tmp_path):
+    pdf_path = tmp_path / 'document.pdf'
+    PartialConverter(fail=False).convert(str(tmp_path / 'document.docx'), str(pdf_path))
+    assert list(tmp_path.iterdir()) == [pdf_path]
+
+
+def test_empty_output_is_a_failure(tmp_path):
+    class SilentConverter(pdf_converters.PdfConverter):
+        def _convert(self, docx_path, pdf_path):
+            pass
+
+    with pytest.raises(PdfConversionError):
+        SilentConverter().convert(str(tmp_path / 'document.docx'), str(tmp_path / 'document.pdf'))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,59 @@
+import pytest
+
+from pricing import Portfolio, compute_premiums, validate_scenarios
+
+
+def scenario(**adjustment):
+    return [{'name': 'test', 'adjustments': [{'taux': 'taux_trc', **adjustment}]}]
+
+
+def test_compute_premiums_by_guarantee():
+    premiums = compute_premiums([100000, 100000], [2, 2], [1, 1], [0.5, 0.5],
+                                ['DO', 'DO+TRC'], [False, True])
+    assert premiums['prime_do'].tolist() == [2000, 2000]
+    assert premiums['prime_trc'].tolist() == [0, 1000]
+    assert premiums['prime_totale'].tolist() == [2000, 3500]
+
+
+def test_valid_scenario():
+    assert validate_scenarios(scenario(delta=0.2, where={'garantie': 'TRC', 'client_vip': True})) == {}
+    assert validate_scenarios(scenario(factor=1.1)) == {}
+
+
+@pytest.mark.parametrize('scenarios, error_key', [
+    ([], 'scenarios'),
+    ([{'adjustments': []}], 'scenarios[0].adjustments'),
+    (scenario(taux='taux_xyz', delta=1), 'scenarios[0].adjustments[0].taux'),
+    (scenario(), 'scenarios[0].adjustments[0]'),
+    (scenario(delta='1'), 'scenarios[0].adjustments[0].delta'),
+    (scenario(delta=True), 'scenarios[0].adjustments[0].delta'),
+    (scenario(delta=float('inf')), 'scenarios[0].adjustments[0].delta'),
+    (scenario(delta=float('nan')), 'scenarios[0].adjustments[0].delta'),
+    (scenario(factor=10 ** 400), 'scenarios[0].adjustments[0].factor'),
+    (scenario(factor=-1), 'scenarios[0].adjustments[0].factor'),
+    (scenario(delta=1, where={'prime_do': 1}), 'scenarios[0].adjustments[0].where'),
+    (scenario(delta=1, where=['garantie']), 'scenarios[0].adjustments[0].where'),
+    (scenario(delta=1, where={'garantie': ['DO', 'TRC']}), 'scenarios[0].adjustments[0].where.garantie'),
+    (scenario(delta=1, where={'client_vip': 'oui'}), 'scenarios[0].adjustments[0].where.client_vip'),
+    (scenario(delta=1, where={'garantie': 1}), 'scenarios[0].adjustments[0].where.garantie'),
+])
+def test_invalid_scenarios(scenarios, error_key):
+    assert error_key in validate_scenarios(scenarios)
+
+
+def test_reprice_applies_where():
+    portfolio = Portfolio.from_rows(
+        [(100000, 1, 1, 0, 'TRC', True, False), (100000, 1, 1, 0, 'TRC', False, False)],
+        ['cout_ouvrage', 'taux_do', 'taux_trc', 'taux_rcmo', 'garantie', 'client_vip', 'souhaite_rcmo'],
+    )
+    premiums = portfolio.reprice([{'taux': 'taux_trc', 'delta': 1, 'where': {'client_vip': True}}])
+    assert premiums['prime_trc'].tolist() == [2000, 1000]
+
+
+def test_scenarios_endpoint_rejects_list_criterion(client, create_devis):
+    create_devis()
+    response = client.post('/api/pricing/scenarios', json={
+        'scenarios': scenario(delta=1, where={'garantie': ['DO', 'TRC']})
+    })
+    assert response.status_code == 400
+    assert 'scenarios[0].adjustments[0].where.garantie' in response.json['details']
@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import tarification
+from docx_template import compile_template
+from render_pool import RenderPool
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(tarification.TEMPLATE_PLACEHOLDERS, [], workers=1)
+    yield pool
+    pool.close()
+
+
+def template_copy(tmp_path, filename):
+    path = tmp_path / 'template.docx'
+    shutil.copy(os.path.join(tarification.TEMPLATE_DIR, filename), path)
+    return str(path)
+
+
+def values():
+    return {key: f"Valeur {key}" for key in tarification.TEMPLATE_PLACEHOLDERS}
+
+
+def test_pool_renders_like_the_caller(tmp_path, pool):
+    template = compile_template(template_copy(tmp_path, 'template_do.docx'), tarification.TEMPLATE_PLACEHOLDERS)
+    output = tmp_path / 'devis.docx'
+    pool.save(template, values(), str(output))
+    assert output.read_bytes() == template.render(values())
+
+
+def test_template_changed_after_compilation(tmp_path, pool):
+    path = template_copy(tmp_path, 'template_do.docx')
+    template = compile_template(path, tarification.TEMPLATE_PLACEHOLDERS)
+    # Le fichier change entre la compilation par l'appelant et le rendu
+    shutil.copy(os.path.join(tarification.TEMPLATE_DIR, 'template_trc.docx'), path)
+
+    output = tmp_path / 'devis.docx'
+    pool.save(template, values(), str(output))
+    assert output.read_bytes() == template.render(values())
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+import rollups
+from conftest import tarification
+
+
+def rollup_rows():
+    """Non-empty rows of devis_rollup, keyed by rollup key."""
+    table = tarification.DevisRollup.__table__
+    with tarification.app.app_context():
+        rows = tarification.db.session.execute(
+            table.select().where(table.c.devis_count != 0)
+        ).mappings().all()
+    return {
+        tuple(row[name] for name in rollups.ROLLUP_DIMENSIONS):
+            [row['devis_count']] + [row[field] for field in rollups.PREMIUM_FIELDS]
+        for row in rows
+    }
+
+
+def aggregated_rows():
+    """The same rows computed from scratch from the devis table."""
+    with tarification.app.app_context():
+        devis = tarification.Devis.query.all()
+        deltas = rollups.contributions([tarification.column_values(d) for d in devis])
+    return {key: delta for key, delta in deltas.items() if delta[0]}
+
+
+def assert_rollup_consistent():
+    actual, expected = rollup_rows(), aggregated_rows()
+    assert actual.keys() == expected.keys()
+    for key, values in expected.items():
+        assert actual[key] == pytest.approx(values)
+
+
+def test_rollup_follows_create_and_update(client, create_devis):
+    devis_id = create_devis(garantie='DO', taux_do=2)
+    create_devis(garantie='TRC', client_vip=True)
+    assert_rollup_consistent()
+
+    response = client.patch(f'/api/devis/{devis_id}', json={'garantie': 'DO+TRC', 'cout_ouvrage': 50000})
+    assert response.status_code == 200
+    assert_rollup_consistent()
+
+
+def test_rollup_consistent_after_concurrent_updates(create_devis):
+    devis_id = create_devis()
+    garanties = ['DO', 'TRC', 'DO+TRC']
+    errors = []
+
+    def update(worker):
+        client = tarification.app.test_client()
+        for i in range(8):
+            response = client.patch(f'/api/devis/{devis_id}', json={
+                'garantie': garanties[(worker + i) % len(garanties)],
+                'cout_ouvrage': 1000 * (worker + 1) + i,
+            })
+            if response.status_code != 200:
+                errors.append(response.json)
+
+    threads = [threading.Thread(target=update, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert_rollup_consistent()
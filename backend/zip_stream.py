@@ -0,0 +1,63 @@
+"""ZIP archives streamed while they are written.
+
+iter_zip writes the archive into a small buffer drained after every chunk of a file, so an
+archive of any size is sent with constant memory and without a temporary file. Files are
+stored without compression: DOCX files are already ZIP archives and PDFs are mostly
+compressed streams. The output is not seekable, so zipfile writes the size and CRC of each
+entry in a data descriptor after its content; the central directory at the end of the
+archive holds them as usual.
+"""
+import io
+import time
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable file collecting the bytes written by ZipFile."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Return and forget the bytes written since the last call."""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(files, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of a ZIP archive of `files`, (name, path or bytes) pairs.
+
+    `files` may be a generator producing the entries as they become available.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, source in files:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            if isinstance(source, bytes):
+                archive.writestr(info, source)
+            else:
+                with open(source, 'rb') as f, archive.open(info, 'w') as entry:
+                    while True:
+                        chunk = f.read(chunk_size)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
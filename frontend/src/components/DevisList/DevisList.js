@@ -1,10 +1,8 @@
 // src/components/DevisList/DevisList.js
-import React, { useState, useMemo, useEffect } from "react";
+import React, { useState, useMemo } from "react";
 import { 
   useReactTable, 
   getCoreRowModel, 
-  getSortedRowModel,
-  getFilteredRowModel,
   flexRender
 } from "@tanstack/react-table";
 import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
@@ -18,85 +16,45 @@ import {
   faStar,
   faShieldAlt,
   faFilter,
-  faTimesCircle
+  faTimesCircle,
+  faSpinner,
+  faFileArchive
 } from "@fortawesome/free-solid-svg-icons";
 import { Link } from "react-router-dom";
-import { getDocxUrl, getPdfUrl } from "../../services/api";
+import { getDocxUrl, getPdfUrl, getBundleUrl } from "../../services/api";
 import "./DevisList.css";
 
-const DevisList = ({ data }) => {
-  const [globalFilter, setGlobalFilter] = useState("");
-  const [sorting, setSorting] = useState([]);
-  const [filters, setFilters] = useState({
-    garantie: "",
-    client_vip: "",
-    date_creation_min: "",
-    date_creation_max: "",
-    prime_min: "",
-    prime_max: "",
-  });
+const DevisList = ({
+  data,
+  loading,
+  filters,
+  onFiltersChange,
+  emptyFilters,
+  sorting,
+  onSortingChange,
+  search,
+  onSearchChange,
+  hasMore,
+  loadingMore,
+  onLoadMore
+}) => {
   const [showFilters, setShowFilters] = useState(false);
-  const [filteredData, setFilteredData] = useState(data);
-  
-  // Mettre à jour les données filtrées quand les filtres ou data changent
-  useEffect(() => {
-    let result = [...data];
-    
-    // Filtre garantie
-    if (filters.garantie) {
-      result = result.filter(item => item.garantie === filters.garantie);
-    }
-    
-    // Filtre VIP
-    if (filters.client_vip !== "") {
-      const isVip = filters.client_vip === "true";
-      result = result.filter(item => item.client_vip === isVip);
-    }
-    
-    // Filtre date minimum
-    if (filters.date_creation_min) {
-      const minDate = new Date(filters.date_creation_min);
-      result = result.filter(item => new Date(item.date_creation) >= minDate);
-    }
-    
-    // Filtre date maximum
-    if (filters.date_creation_max) {
-      const maxDate = new Date(filters.date_creation_max);
-      maxDate.setHours(23, 59, 59); // Pour inclure tout le jour
-      result = result.filter(item => new Date(item.date_creation) <= maxDate);
-    }
-    
-    // Filtre prime minimum
-    if (filters.prime_min) {
-      const min = parseFloat(filters.prime_min);
-      result = result.filter(item => (item.prime_totale || 0) >= min);
-    }
-    
-    // Filtre prime maximum
-    if (filters.prime_max) {
-      const max = parseFloat(filters.prime_max);
-      result = result.filter(item => (item.prime_totale || 0) <= max);
-    }
-    
-    setFilteredData(result);
-  }, [data, filters]);
   
+  // Les filtres et le tri sont appliqués côté serveur : chaque changement recharge la liste
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
-    setFilters(prev => ({ ...prev, [name]: value }));
+    onFiltersChange(prev => ({ ...prev, [name]: value }));
   };
   
   const resetFilters = () => {
-    setFilters({
-      garantie: "",
-      client_vip: "",
-      date_creation_min: "",
-      date_creation_max: "",
-      prime_min: "",
-      prime_max: "",
-    });
+    onFiltersChange(emptyFilters);
   };
   
+  // Archive ZIP des PDF des devis affichés (1000 au plus par archive)
+  const bundleUrl = data.length > 0 && data.length <= 1000
+    ? getBundleUrl(data.map(devis => devis.id))
+    : null;
+  
   // Vérifier si des filtres sont actifs
   const hasActiveFilters = Object.values(filters).some(value => 
     value !== "" && value !== null && value !== undefined
@@ -111,10 +69,12 @@ const DevisList = ({ data }) => {
       {
         header: "Client",
         accessorKey: "nom_client",
+        enableSorting: false,
       },
       {
         header: "Garanties",
         accessorKey: "garantie",
+        enableSorting: false,
         cell: info => {
           const garantie = info.getValue();
           let badgeClass = "bg-secondary"; // Couleur par défaut
@@ -139,6 +99,7 @@ const DevisList = ({ data }) => {
       {
         header: "Statut",
         accessorKey: "client_vip",
+        enableSorting: false,
         cell: info => (
           info.getValue() ? (
             <span className="badge bg-warning text-dark">
@@ -195,17 +156,15 @@ const DevisList = ({ data }) => {
   );
   
   const table = useReactTable({
-    data: filteredData,
+    data,
     columns,
     state: {
-      globalFilter,
       sorting
     },
-    onGlobalFilterChange: setGlobalFilter,
-    onSortingChange: setSorting,
+    manualSorting: true,
+    enableMultiSort: false,
+    onSortingChange: onSortingChange,
     getCoreRowModel: getCoreRowModel(),
-    getSortedRowModel: getSortedRowModel(),
-    getFilteredRowModel: getFilteredRowModel(),
   });
   
   return (
@@ -228,17 +187,24 @@ const DevisList = ({ data }) => {
               Réinitialiser
             </button>
           )}
-          {hasActiveFilters && (
+          {bundleUrl && (
+            <a href={bundleUrl} className="btn btn-outline-danger ms-2">
+              <FontAwesomeIcon icon={faFileArchive} className="me-2" />
+              PDF affichés (ZIP)
+            </a>
+          )}
+          {(hasActiveFilters || search.trim()) && (
             <span className="ms-3 badge bg-primary">
-              {filteredData.length} résultat(s) sur {data.length} devis
+              {data.length}{hasMore ? "+" : ""} résultat(s)
             </span>
           )}
         </div>
         <div>
+          {/* Recherche plein texte côté serveur (numéro, client, adresse, description) */}
           <input
             className="form-control"
-            value={globalFilter ?? ""}
-            onChange={e => setGlobalFilter(e.target.value)}
+            value={search}
+            onChange={e => onSearchChange(e.target.value)}
             placeholder="Recherche rapide..."
           />
         </div>
@@ -359,7 +325,14 @@ const DevisList = ({ data }) => {
             ))}
           </thead>
           <tbody>
-            {table.getRowModel().rows.length === 0 ? (
+            {loading ? (
+              <tr>
+                <td colSpan={columns.length} className="text-center py-4">
+                  <FontAwesomeIcon icon={faSpinner} spin className="me-2" />
+                  Chargement des devis...
+                </td>
+              </tr>
+            ) : table.getRowModel().rows.length === 0 ? (
               <tr>
                 <td colSpan={columns.length} className="text-center py-4">
                   Aucun devis trouvé
@@ -379,6 +352,19 @@ const DevisList = ({ data }) => {
           </tbody>
         </table>
       </div>
+      
+      {hasMore && !loading && (
+        <div className="text-center">
+          <button 
+            className="btn btn-outline-primary" 
+            onClick={onLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore && <FontAwesomeIcon icon={faSpinner} spin className="me-2" />}
+            Charger plus de devis
+          </button>
+        </div>
+      )}
     </div>
   );
 };
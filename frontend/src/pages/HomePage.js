@@ -1,22 +1,115 @@
 // src/pages/HomePage.js
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import { Link } from "react-router-dom";
 import DevisList from "../components/DevisList/DevisList";
-import { getDevisList } from "../services/api";
+import { getDevisList, searchDevis, getChangesStreamUrl } from "../services/api";
 import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
 import { faPlus, faSpinner } from "@fortawesome/free-solid-svg-icons";
 
+const EMPTY_FILTERS = {
+  garantie: "",
+  client_vip: "",
+  date_creation_min: "",
+  date_creation_max: "",
+  prime_min: "",
+  prime_max: "",
+};
+
+// Colonnes affichées par la liste : le serveur n'envoie que celles-ci
+const LIST_FIELDS = [
+  "id",
+  "numero_opportunite",
+  "nom_client",
+  "garantie",
+  "client_vip",
+  "prime_totale",
+  "date_creation",
+];
+
+// Construire les paramètres de requête (filtres, tri, curseur) pour l'API
+const buildListParams = (filters, sorting, cursor) => {
+  const params = { fields: LIST_FIELDS.join(",") };
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== "" && value !== null && value !== undefined) {
+      params[key] = value;
+    }
+  });
+  if (sorting.length > 0) {
+    params.sort = sorting[0].id;
+    params.order = sorting[0].desc ? "desc" : "asc";
+  }
+  if (cursor) {
+    params.cursor = cursor;
+  }
+  return params;
+};
+
+// Délai avant de lancer la recherche pendant la saisie (ms)
+const SEARCH_DELAY = 300;
+
+// Liste paginée par curseur, ou résultats de recherche paginés par offset
+const fetchPage = (filters, sorting, search, next) => {
+  const params = buildListParams(filters, sorting);
+  if (!search) {
+    if (next) params.cursor = next;
+    return getDevisList(params);
+  }
+  delete params.sort;
+  delete params.order;
+  params.q = search;
+  if (next) params.offset = next;
+  return searchDevis(params);
+};
+
+// Appliquer une modification reçue du flux à la liste affichée (tri par défaut, sans filtre).
+// Le tri par défaut est date_creation décroissante, remise à jour à chaque modification :
+// le devis est retiré de sa place, puis remis en tête s'il n'est pas plus ancien que le
+// premier devis affiché ; sinon il arrivera avec les pages suivantes
+const applyChange = (rows, change) => {
+  const others = rows.filter(row => row.id !== change.id);
+  if (change.deleted) return others;
+  if (others.length > 0 && new Date(change.devis.date_creation) < new Date(others[0].date_creation)) {
+    return others;
+  }
+  return [change.devis, ...others];
+};
+
+const hasFilters = (filters) => Object.values(filters).some(value => value !== "");
+
 const HomePage = () => {
   const [devis, setDevis] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filters, setFilters] = useState(EMPTY_FILTERS);
+  const [sorting, setSorting] = useState([]);
+  const [search, setSearch] = useState("");
+  const [debouncedSearch, setDebouncedSearch] = useState("");
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
+  // Version de la table à la première lecture : point de départ du flux de modifications
+  const [streamSince, setStreamSince] = useState(null);
+  const [refresh, setRefresh] = useState(0);
+  const liveRef = useRef(true);
+  const reloadTimer = useRef(null);
 
+  liveRef.current = !debouncedSearch && sorting.length === 0 && !hasFilters(filters);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search.trim()), SEARCH_DELAY);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  // Recharger la première page à chaque changement de filtres, de tri ou de recherche
   useEffect(() => {
     const loadDevis = async () => {
       try {
         setLoading(true);
-        const response = await getDevisList();
-        setDevis(response.data);
+        const response = await fetchPage(filters, sorting, debouncedSearch);
+        setDevis(response.data.items);
+        setNextCursor(debouncedSearch ? response.data.next_offset : response.data.next_cursor);
+        if (response.data.version !== undefined) {
+          setStreamSince(prev => (prev === null ? response.data.version : prev));
+        }
         setError(null);
       } catch (err) {
         console.error("Erreur lors du chargement des devis:", err);
@@ -27,7 +120,56 @@ const HomePage = () => {
     };
 
     loadDevis();
-  }, []);
+  }, [filters, sorting, debouncedSearch, refresh]);
+
+  // Mise à jour en direct : la liste par défaut est modifiée sur place, une liste filtrée,
+  // triée ou recherchée est rechargée (regroupé sur SEARCH_DELAY)
+  useEffect(() => {
+    if (streamSince === null) return undefined;
+    // EventSource reprend seul après la dernière version reçue (Last-Event-ID)
+    const source = new EventSource(
+      getChangesStreamUrl({ since: streamSince, fields: LIST_FIELDS.join(",") })
+    );
+    source.addEventListener("change", (event) => {
+      const change = JSON.parse(event.data);
+      if (liveRef.current) {
+        setDevis(prev => applyChange(prev, change));
+      } else if (!reloadTimer.current) {
+        reloadTimer.current = setTimeout(() => {
+          reloadTimer.current = null;
+          setRefresh(value => value + 1);
+        }, SEARCH_DELAY);
+      }
+    });
+    // Flux refusé (410 après une réinitialisation de la base) : tout recharger et repartir
+    // de la nouvelle version
+    source.addEventListener("error", () => {
+      if (source.readyState === EventSource.CLOSED) {
+        setStreamSince(null);
+        setRefresh(value => value + 1);
+      }
+    });
+    return () => {
+      source.close();
+      clearTimeout(reloadTimer.current);
+      reloadTimer.current = null;
+    };
+  }, [streamSince]);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await fetchPage(filters, sorting, debouncedSearch, nextCursor);
+      setDevis(prev => [...prev, ...response.data.items]);
+      setNextCursor(debouncedSearch ? response.data.next_offset : response.data.next_cursor);
+    } catch (err) {
+      console.error("Erreur lors du chargement des devis:", err);
+      setError("Impossible de charger les devis. Veuillez réessayer.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [filters, sorting, debouncedSearch, nextCursor]);
 
   return (
     <div className="container py-4">
@@ -38,20 +180,28 @@ const HomePage = () => {
         </Link>
       </div>
 
-      {loading ? (
-        <div className="text-center my-5">
-          <FontAwesomeIcon icon={faSpinner} spin size="3x" className="mb-3" />
-          <p>Chargement des devis...</p>
-        </div>
-      ) : error ? (
+      {error && (
         <div className="alert alert-danger" role="alert">
           {error}
         </div>
-      ) : (
-        <DevisList data={devis} />
       )}
+
+      <DevisList
+        data={devis}
+        loading={loading}
+        filters={filters}
+        onFiltersChange={setFilters}
+        emptyFilters={EMPTY_FILTERS}
+        sorting={sorting}
+        onSortingChange={setSorting}
+        search={search}
+        onSearchChange={setSearch}
+        hasMore={Boolean(nextCursor)}
+        loadingMore={loadingMore}
+        onLoadMore={loadMore}
+      />
     </div>
   );
 };
 
-export default HomePage;
\ No newline at end of file
+export default HomePage;
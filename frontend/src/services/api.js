@@ -3,12 +3,18 @@ import axios from 'axios';
 const API_URL = 'http://localhost:5000/api';
 
 // Fonctions d'API pour les devis
-export const getDevisList = () => axios.get(`${API_URL}/devis`);
+export const getDevisList = (params = {}) => axios.get(`${API_URL}/devis`, { params });
+export const searchDevis = (params = {}) => axios.get(`${API_URL}/devis/search`, { params });
 export const getDevisById = (id) => axios.get(`${API_URL}/devis/${id}`);
 export const createDevis = (devisData) => axios.post(`${API_URL}/devis`, devisData);
 export const updateDevis = (id, devisData) => axios.patch(`${API_URL}/devis/${id}`, devisData);
 export const getDocxUrl = (id) => `${API_URL}/devis/${id}/docx`;
 export const getPdfUrl = (id) => `${API_URL}/devis/${id}/pdf`;
+export const getBundleUrl = (ids, format = 'pdf') =>
+  `${API_URL}/devis/bundle?${new URLSearchParams({ ids: ids.join(','), format })}`;
+export const getDevisChanges = (params = {}) => axios.get(`${API_URL}/devis/changes`, { params });
+export const getChangesStreamUrl = (params = {}) =>
+  `${API_URL}/devis/changes/stream?${new URLSearchParams(params)}`;
 
 // Pour la compatibilité avec le code existant
 const api = {